@@ -1,11 +1,22 @@
 from app.model import User_json
-from app.services import  ask_aipipe, ask_hugging_face, build_prompt_xml, save_llm_output_xml
-from app.services.github_service_2 import push_to_github
-from app.services.evaluation_service import post_evaluation
-from app.utils import clear_generated_app_folder_by_round, load_context, save_context
+from app.services import  ask_aipipe, ask_hugging_face, build_prompt_xml, save_llm_output_xml, PROMPT_TEMPLATE_VERSION, \
+    parse_llm_output_xml, route_job
+from app.services.job_queue import JOB_WORKERS
+from app.services.evaluation_service import submit_evaluation
+from app.services.task_coordinator import coordinator
+from app.database import save_job
+from app.utils import load_context, save_context, workspace_for, stage_workspace, commit_workspace, discard_staging, \
+    load_attachments, discard_attachments
+from app.utils.deadline import Deadline, SUBMIT_RESERVE_SECONDS
 from dotenv import load_dotenv
 import os
-from app.logger import get_logger
+import time
+import contextvars
+import importlib
+from concurrent.futures import ThreadPoolExecutor
+from app.logger import get_logger, log_context, set_log_context
+from app.metrics import STAGE_SECONDS, JOB_SECONDS, JOBS_TOTAL
+from app.tracing import start_trace, span, maybe_profile
 
 
 
@@ -13,66 +24,242 @@ load_dotenv()
 
 log = get_logger(__name__)
 
-def generate_app(data: User_json):
-    context_file = os.path.join(os.getcwd(), "app", "data", "context.json")
+# Minimum time a stage needs to be worth starting; below this the job skips
+# ahead and submits the best result it already has.
+MIN_GENERATION_SECONDS = float(os.getenv("MIN_GENERATION_SECONDS", 60))
+MIN_PUSH_SECONDS = float(os.getenv("MIN_PUSH_SECONDS", 20))
 
-    # Step 1: Clean generated_app folder
-    clear_generated_app_folder_by_round(folder_path=os.path.join(os.getcwd(), "generated_app"),round_number=data.round)
+# Runs repo provisioning alongside LLM generation (one slot per job worker)
+_provision_pool = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="provision")
 
-    # Step 2: Determine context based on round
+
+def _github():
+    """github_service_2 pulls in PyGithub, so it's loaded on first use (or by the startup prewarm)."""
+    return importlib.import_module("app.services.github_service_2")
+
+
+def generate_app(data: User_json, deadline: Deadline | None = None):
+    """
+    Generate the app into the task's workspace; returns the provider that
+    answered (or None) and the model routing decision with its attempts.
+    """
+    workspace = workspace_for(data.task)
+
+    # Step 1: Determine context based on round
     previous_context = None
     if data.round > 1:
-        previous_context = load_context()
-
-    # Step 3: Build the prompt
-    prompt = build_prompt_xml(
-        task_description=data.brief,
-        attachments=data.attachments,
-        checks=data.checks,
-        round_number=data.round,
-        previous_context=previous_context
-    )
-
-    # Step 4: Ask the LLM (try AIPipe first, then fallback to Hugging Face)
-    response = None
+        with span("load_context"):
+            previous_context = load_context(task=data.task, before_round=data.round)
+
+    # Step 2: Build the prompt (attachments are read back from disk only for this)
+    with span("build_prompt") as attrs:
+        attachments = load_attachments(data.attachments)
+        prompt = build_prompt_xml(
+            task_description=data.brief,
+            attachments=attachments,
+            checks=data.checks,
+            round_number=data.round,
+            previous_context=previous_context
+        )
+        attrs["prompt_chars"] = len(prompt)
+        attrs["prompt_version"] = PROMPT_TEMPLATE_VERSION
+
+    # Step 3: Ask the LLM: the model is routed by the size of the job, unusable answers escalate
+    # to the next model and Hugging Face is the last resort.
+    # Timeouts leave enough of the budget for pushing and submitting.
+    deadline = deadline or Deadline.from_start()
+    with span("route") as attrs:
+        routing = route_job(data.brief, data.checks, attachments, data.round, previous_context)
+        attrs.update(tier=routing["tier"], model=routing["models"][0])
+    response, parsed, provider = _ask_llm(prompt, routing, deadline)
+
+    # Step 4: Save the LLM-generated files into a fresh tree and swap it in only if the
+    # response parsed, so a failed save never leaves a half-written workspace to be pushed
+    saved = None
+    with span("save_output"):
+        staging = stage_workspace(workspace)
+        if parsed:
+            try:
+                saved = save_llm_output_xml(response_xml=response, base_dir=staging, parsed=parsed)
+            except Exception as e:
+                log.info(f"Some error occurred in saving files: {e}")
+
+    with span("swap_workspace"):
+        if saved is not None or data.round == 1:
+            # Round 1 with nothing usable still starts from an empty workspace
+            commit_workspace(workspace, staging, keep_git=data.round > 1)
+        else:
+            log.warning(f"No usable output for round {data.round}, keeping the previous workspace.")
+            discard_staging(staging)
+
+    # Step 5: Save current response as context for next round
     try:
-        log.info("Asking AIPipe model...")
-        response = ask_aipipe(input_prompt=prompt, aipipe_token=os.getenv("AIPIPE_TOKEN"))
+        with span("save_context"):
+            save_context(response, round_number=data.round, task=data.task, parsed=parsed)
     except Exception as e:
-        log.warning(f"AIPipe failed ({e}), switching to Hugging Face...")
+        log.info(f"Failed to save context: {e}")
+
+    return provider, routing
+
+
+def _usable(response):
+    """Parsed response if it contains at least one file, else None."""
+    parsed = parse_llm_output_xml(response) if response else None
+    return parsed if parsed and parsed["files"] else None
+
+
+def _ask_llm(prompt: str, routing: dict, deadline: Deadline):
+    """Try the routed AIPipe models in order, then Hugging Face; returns (response, parsed, provider)."""
+    response = provider = None
+    for model in routing["models"]:
+        if routing["attempts"] and not deadline.can_afford(MIN_GENERATION_SECONDS / 2, reserve=_push_reserve()):
+            log.warning(f"No time left to escalate to {model}.")
+            return response, None, provider
+        log.info(f"Asking AIPipe model {model}...")
+        try:
+            candidate = ask_aipipe(input_prompt=prompt, aipipe_token=os.getenv("AIPIPE_TOKEN"), model=model,
+                                   timeout=deadline.timeout(reserve=_push_reserve()),
+                                   cache_key=f"build-prompt-{PROMPT_TEMPLATE_VERSION}")
+        except Exception as e:
+            log.warning(f"AIPipe {model} failed ({e}).")
+            routing["attempts"].append({"provider": "aipipe", "model": model, "outcome": "error"})
+            continue
+        response, provider = candidate, "aipipe"
+        parsed = _usable(candidate)
+        routing["attempts"].append({"provider": "aipipe", "model": model, "outcome": "ok" if parsed else "invalid"})
+        if parsed:
+            return response, parsed, provider
+        log.warning(f"AIPipe {model} returned no usable files.")
+
+    if not deadline.can_afford(MIN_GENERATION_SECONDS / 2, reserve=_push_reserve()):
+        log.warning("No time left for the Hugging Face fallback.")
+    else:
         log.info("Asking Hugging Face model...")
-        response = ask_hugging_face(prompt=prompt, hf_token=os.getenv("HF_API_TOKEN"))
+        try:
+            candidate = ask_hugging_face(prompt=prompt, hf_token=os.getenv("HF_API_TOKEN"),
+                                         timeout=deadline.timeout(reserve=_push_reserve()))
+            parsed = _usable(candidate)
+            routing["attempts"].append({"provider": "hugging_face", "outcome": "ok" if parsed else "invalid"})
+            if parsed or not response:
+                return candidate, parsed, "hugging_face"
+        except Exception as hf_error:
+            log.warning(f"Hugging Face failed ({hf_error}).")
+            routing["attempts"].append({"provider": "hugging_face", "outcome": "error"})
 
     if not response:
         log.error("Both AIPipe and Hugging Face failed.")
+    return response, None, provider
 
-    # Step 5: Clear generated folder again before saving new output
-    clear_generated_app_folder_by_round(folder_path=os.path.join(os.getcwd(), "generated_app"),
-                                        round_number=data.round
-                                        )
 
-    # Step 6: Save the LLM-generated files
-    try:
-        save_llm_output_xml(response_xml=response)
-    except Exception as e:
-        log.info(f"Some error occurred in saving files: {e}")
 
-    # Step 7: Save current response as context for next round
+def _push_reserve() -> float:
+    """Budget kept back during generation for the push plus the submission."""
+    return SUBMIT_RESERVE_SECONDS + MIN_PUSH_SECONDS
+
+
+def _wait_provisioned(future, deadline: Deadline):
+    """Result of a provision_repo future, or None so the push provisions in-line."""
+    if future is None:
+        return None
     try:
-        save_context(response, round_number=data.round)
+        with span("wait_provisioned"):
+            return future.result(timeout=deadline.timeout())
     except Exception as e:
-        log.info(f"Failed to save context: {e}")
+        log.warning(f"Repo provisioning failed ({e}), creating the repo during push instead.")
+        return None
+
+
+def _record_outcome(outcome: str, received_at: float, stage_durations: dict | None = None):
+    """Export the stage timings and end-to-end time of a finished job."""
+    for stage, seconds in (stage_durations or {}).items():
+        STAGE_SECONDS.observe(seconds, stage=stage)
+    JOB_SECONDS.observe(time.time() - received_at, outcome=outcome)
+    JOBS_TOTAL.inc(outcome=outcome)
+
 
+def build_and_deploy(data:User_json,task_id: str, received_at: float | None = None):
+    # Every log record of this job carries job_id/task/round (and the current stage);
+    # its spans (and profile, when asked for) are stored with the job record
+    with log_context(job_id=task_id, task=data.task, round=data.round, stage="start"), \
+            start_trace() as trace, maybe_profile(task_id, enabled=data.profile) as profile_path:
+        try:
+            _build_and_deploy(data, task_id, received_at)
+        except Exception:
+            save_job(task_id, "failed", finished_at=time.time())
+            _record_outcome("failed", received_at or time.time())
+            raise
+        finally:
+            save_job(task_id, trace=trace.to_dict(), profile_path=profile_path)
+            discard_attachments(task_id)
 
 
-def build_and_deploy(data:User_json,task_id: str):
+def _build_and_deploy(data:User_json,task_id: str, received_at: float | None = None):
     log.info(f"Starting task {task_id}...")
-    # Generating App form llm
-    generate_app(data)
+    received_at = received_at or time.time()
+    deadline = Deadline.from_start(received_at)
+
+    # A newer round of this task arrived while we were queued: drop this one
+    if coordinator.is_superseded(data.task, data.round):
+        log.info(f"Task {task_id}: round {data.round} of {data.task} superseded, skipping.")
+        save_job(task_id, "superseded", finished_at=time.time())
+        _record_outcome("superseded", received_at)
+        return
+    started_at = time.time()
+    stage_durations = {"queued": round(started_at - received_at, 3)}
+    save_job(task_id, "running", started_at=started_at, stage_durations=stage_durations)
+
+    # Round 1: create the repo and warm its main ref while the LLM is generating,
+    # so only the commit and Pages enablement are left after the model returns
+    provisioning = None
+    if data.round == 1 and deadline.can_afford(MIN_PUSH_SECONDS):
+        provisioning = _provision_pool.submit(contextvars.copy_context().run, _github().provision_repo, data.task,
+                                             deadline)
+
+    # Generating App form llm (skipped if it can no longer finish in time)
+    if deadline.can_afford(MIN_GENERATION_SECONDS, reserve=_push_reserve()):
+        set_log_context(stage="generate")
+        stage_start = time.time()
+        with span("generate"):
+            provider, routing = generate_app(data, deadline=deadline)
+        stage_durations["generate"] = round(time.time() - stage_start, 3)
+        save_job(task_id, "generated", provider=provider, routing=routing, stage_durations=stage_durations)
+    else:
+        log.warning(f"Task {task_id}: skipping generation, {deadline} is too short.")
+
+    # A newer round arrived during generation: never commit over it
+    if coordinator.is_superseded(data.task, data.round):
+        log.info(f"Task {task_id}: round {data.round} of {data.task} superseded before commit, skipping.")
+        save_job(task_id, "superseded", finished_at=time.time(), stage_durations=stage_durations)
+        _record_outcome("superseded", received_at, stage_durations)
+        return
+
     # Pushing the generated app to github
-    response_dict=push_to_github(task_id=data.task, round_number=data.round, base_dir="generated_app")
+    if deadline.can_afford(MIN_PUSH_SECONDS):
+        set_log_context(stage="push")
+        stage_start = time.time()
+        with span("push"):
+            response_dict=_github().push_to_github(task_id=data.task, round_number=data.round,
+                                                   base_dir=workspace_for(data.task), deadline=deadline,
+                                                   provisioned=_wait_provisioned(provisioning, deadline))
+        stage_durations["push"] = round(time.time() - stage_start, 3)
+    else:
+        # Best result available: the repo as left by the previous round
+        log.warning(f"Task {task_id}: skipping push, {deadline} is too short.")
+        repo_name = _github().repo_name_for(data.task)
+        response_dict = {"repo_name": repo_name, "commit_sha": "", "pages_url": _github().pages_url_for(repo_name)}
     
+    # The commit is done: let the next round of this task start right away
+    coordinator.release_own(data.task)
+
+    # push_to_github logs and swallows its errors: without a repo and commit there is nothing to evaluate
+    if response_dict.get("repo_name") is None or response_dict.get("commit_sha") is None:
+        log.error(f"Task {task_id}: push produced no repo or commit, not submitting an evaluation.")
+        save_job(task_id, "failed", finished_at=time.time(), stage_durations=stage_durations)
+        _record_outcome("failed", received_at, stage_durations)
+        return
+
     # Making post request to Evaluation URL
+    set_log_context(stage="submit")
     evaluation_url = data.evaluation_url
     email = data.email
     task = data.task
@@ -94,5 +281,10 @@ def build_and_deploy(data:User_json,task_id: str):
         "pages_url": pages_url,
     }
       
-    post_evaluation(evaluation_url, payload)
+    # Delivery is handled by the outbox dispatcher, not this worker thread
+    with span("submit"):
+        submit_evaluation(job_id=task_id, evaluation_url=evaluation_url, payload=payload, requested_at=received_at)
+    save_job(task_id, "completed", finished_at=time.time(), repo_name=repo_name, commit_sha=commit_sha,
+             stage_durations=stage_durations)
+    _record_outcome("completed", received_at, stage_durations)
     log.info(f"Task {task_id} completed.")
@@ -0,0 +1 @@
+from .pool import offload, warm_cpu_pool, shutdown_cpu_pool, CPU_POOL_WORKERS, CPU_POOL_THRESHOLD_BYTES
@@ -0,0 +1,67 @@
+import os
+import threading
+import multiprocessing
+from app.logger import get_logger
+
+log = get_logger(__name__)
+
+# Worker processes for CPU-bound steps (XML parsing, base64); 0 runs everything in-line
+CPU_POOL_WORKERS = int(os.getenv("CPU_POOL_WORKERS", min(4, os.cpu_count() or 1)))
+# Inputs smaller than this are cheaper to handle in-line than to ship to a worker
+CPU_POOL_THRESHOLD_BYTES = int(os.getenv("CPU_POOL_THRESHOLD_BYTES", 512 * 1024))
+# forkserver/spawn workers don't inherit the threads and locks of this process
+CPU_POOL_START_METHOD = os.getenv("CPU_POOL_START_METHOD", "forkserver")
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Imported here: the pool is only built once a large input shows up
+                from concurrent.futures import ProcessPoolExecutor
+                method = CPU_POOL_START_METHOD
+                if method not in multiprocessing.get_all_start_methods():
+                    method = "spawn"
+                _pool = ProcessPoolExecutor(max_workers=CPU_POOL_WORKERS,
+                                            mp_context=multiprocessing.get_context(method))
+                log.info(f"Started CPU pool with {CPU_POOL_WORKERS} {method} workers.")
+    return _pool
+
+
+def offload(fn, *args, size: int):
+    """
+    Run fn(*args) in the CPU pool when `size` (bytes of input) reaches
+    CPU_POOL_THRESHOLD_BYTES, otherwise in the calling thread. The caller
+    blocks either way, but a worker process doesn't hold this process's GIL.
+    `fn` must be a module-level function that neither logs nor touches
+    shared state; pass file paths rather than file contents where possible.
+    """
+    if CPU_POOL_WORKERS <= 0 or size < CPU_POOL_THRESHOLD_BYTES:
+        return fn(*args)
+    from concurrent.futures.process import BrokenProcessPool
+    try:
+        return _get_pool().submit(fn, *args).result()
+    except BrokenProcessPool as e:
+        log.warning(f"CPU pool broke ({e}), restarting it; running {fn.__name__} in-line.")
+        shutdown_cpu_pool(wait=False)
+        return fn(*args)
+
+
+def warm_cpu_pool():
+    """Start every worker now, so the first large job doesn't wait for process startup."""
+    if CPU_POOL_WORKERS > 0:
+        pool = _get_pool()
+        for future in [pool.submit(os.getpid) for _ in range(CPU_POOL_WORKERS)]:
+            future.result()
+
+
+def shutdown_cpu_pool(wait: bool = True):
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait, cancel_futures=not wait)
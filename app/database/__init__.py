@@ -1 +1,22 @@
-from .sql_service import save_job, load_job
\ No newline at end of file
+from .sql_service import (
+    get_connection,
+    init_db,
+    save_job,
+    load_job,
+    load_job_record,
+    flush_job_updates,
+    compact_database,
+    maintenance,
+    enqueue_evaluation,
+    claim_due_evaluations,
+    mark_evaluation_delivered,
+    reschedule_evaluation,
+    mark_evaluation_failed,
+    load_evaluation_status,
+    register_task_round,
+    load_latest_round,
+    record_llm_call,
+    load_llm_calls,
+    llm_usage_summary,
+    LLM_USAGE_GROUPS,
+)
\ No newline at end of file
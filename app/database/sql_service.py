@@ -1,31 +1,576 @@
 import sqlite3
 import os
+import json
+import time
+import atexit
+import threading
+from app.logger import get_logger
+
+log = get_logger(__name__)
 
 database_path = os.path.join(os.getcwd(), "app", "data", "jobs.db")
-os.makedirs(os.path.dirname(database_path), exist_ok=True)  # ensure folder exists
 
-# Create table if not exists
-with sqlite3.connect(database_path) as con:
-    cur = con.cursor()
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS jobs (
-            id TEXT PRIMARY KEY,
-            status TEXT
+# Milliseconds a connection waits on a locked database before failing
+BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", 5000))
+
+# Job status updates are buffered and written together
+STATUS_BATCH_INTERVAL = float(os.getenv("DB_STATUS_BATCH_INTERVAL", 0.25))
+STATUS_BATCH_MAX = int(os.getenv("DB_STATUS_BATCH_MAX", 100))
+
+# Finished rows older than this are removed by compact_database
+RETENTION_DAYS = float(os.getenv("DB_RETENTION_DAYS", 30))
+COMPACT_INTERVAL_SECONDS = float(os.getenv("DB_COMPACT_INTERVAL_SECONDS", 3600))
+
+# Job statuses after which a job never changes again
+FINISHED_JOB_STATUSES = ("completed", "failed", "superseded")
+
+
+# ---------------- Connections ----------------
+
+_local = threading.local()
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+
+def get_connection() -> sqlite3.Connection:
+    """
+    Return this thread's connection, opening it on first use.
+    Every thread keeps one WAL-mode connection with a busy timeout, so
+    concurrent workers read while one writes instead of failing with
+    'database is locked'. The schema is created on the first connection of
+    the process unless init_db() already ran (from the app's lifespan hook).
+    """
+    con = _open_connection()
+    if not _schema_ready:
+        init_db()
+    return con
+
+
+def _open_connection() -> sqlite3.Connection:
+    con = getattr(_local, "con", None)
+    if con is None:
+        os.makedirs(os.path.dirname(database_path), exist_ok=True)
+        con = sqlite3.connect(database_path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+        con.row_factory = sqlite3.Row
+        con.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        # Must come before journal_mode: switching to WAL writes the header and
+        # fixes the vacuum mode (lets compaction return pages to the OS)
+        con.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        con.execute("PRAGMA journal_mode = WAL")
+        con.execute("PRAGMA synchronous = NORMAL")
+        _local.con = con
+    return con
+
+
+# ---------------- Schema ----------------
+
+JOB_COLUMNS = {
+    "task": "TEXT",
+    "round": "INTEGER",
+    "email": "TEXT",
+    "status": "TEXT",
+    "created_at": "REAL",
+    "started_at": "REAL",
+    "finished_at": "REAL",
+    "updated_at": "REAL",
+    "stage_durations": "TEXT",
+    "provider": "TEXT",
+    "repo_name": "TEXT",
+    "commit_sha": "TEXT",
+    "trace": "TEXT",
+    "profile_path": "TEXT",
+    "routing": "TEXT",
+}
+
+# Columns holding JSON documents
+JSON_JOB_COLUMNS = ("stage_durations", "trace", "routing")
+
+
+def init_db():
+    """Create tables and indexes, and add columns missing from older databases."""
+    global _schema_ready
+    with _schema_lock:
+        if _schema_ready:
+            return
+        con = _open_connection()
+        _create_schema(con)
+        _enable_incremental_vacuum(con)
+        _schema_ready = True
+
+
+def _enable_incremental_vacuum(con: sqlite3.Connection):
+    """Databases created before auto_vacuum was set need one full VACUUM to switch over."""
+    if con.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        log.info("Switching the database to incremental auto_vacuum (one-off VACUUM)...")
+        con.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        con.execute("VACUUM")
+
+
+def _create_schema(con: sqlite3.Connection):
+    with con:
+        con.execute("CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, status TEXT)")
+        existing = {row["name"] for row in con.execute("PRAGMA table_info(jobs)")}
+        for column, column_type in JOB_COLUMNS.items():
+            if column not in existing:
+                con.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+        con.execute("CREATE INDEX IF NOT EXISTS idx_jobs_task_round ON jobs (task, round)")
+        con.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)")
+        con.execute("CREATE INDEX IF NOT EXISTS idx_jobs_updated ON jobs (updated_at)")
+
+        con.execute('''
+            CREATE TABLE IF NOT EXISTS evaluation_outbox (
+                job_id TEXT PRIMARY KEY,
+                evaluation_url TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                requested_at REAL NOT NULL,
+                deadline_at REAL NOT NULL,
+                next_attempt_at REAL NOT NULL,
+                lease_until REAL,
+                last_error TEXT,
+                delivered_at REAL
+            )
+        ''')
+        con.execute("CREATE INDEX IF NOT EXISTS idx_outbox_due ON evaluation_outbox (status, next_attempt_at)")
+
+        con.execute('''
+            CREATE TABLE IF NOT EXISTS task_rounds (
+                task TEXT PRIMARY KEY,
+                latest_round INTEGER NOT NULL,
+                latest_job_id TEXT,
+                updated_at REAL
+            )
+        ''')
+
+        # Per-task, per-round LLM context (see app/utils/llm_context.py).
+        # File contents live zlib-compressed in context_blobs keyed by SHA-256,
+        # shared by every round in which a file is unchanged.
+        con.execute('''
+            CREATE TABLE IF NOT EXISTS context_rounds (
+                task TEXT NOT NULL,
+                round INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                raw_hash TEXT,
+                PRIMARY KEY (task, round)
+            )
+        ''')
+        con.execute("CREATE INDEX IF NOT EXISTS idx_context_rounds_raw ON context_rounds (raw_hash)")
+        con.execute("CREATE INDEX IF NOT EXISTS idx_context_rounds_created ON context_rounds (created_at)")
+        con.execute('''
+            CREATE TABLE IF NOT EXISTS context_files (
+                task TEXT NOT NULL,
+                round INTEGER NOT NULL,
+                path TEXT NOT NULL,
+                language TEXT,
+                blob_hash TEXT NOT NULL,
+                PRIMARY KEY (task, round, path)
+            )
+        ''')
+        con.execute("CREATE INDEX IF NOT EXISTS idx_context_files_blob ON context_files (blob_hash)")
+        con.execute('''
+            CREATE TABLE IF NOT EXISTS context_blobs (
+                hash TEXT PRIMARY KEY,
+                data BLOB NOT NULL
+            )
+        ''')
+
+        # One row per LLM provider call (see app/services/llm_ledger.py)
+        con.execute('''
+            CREATE TABLE IF NOT EXISTS llm_calls (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id TEXT,
+                task TEXT,
+                round INTEGER,
+                provider TEXT NOT NULL,
+                model TEXT,
+                attempt INTEGER NOT NULL DEFAULT 1,
+                outcome TEXT NOT NULL,
+                input_tokens INTEGER,
+                cached_input_tokens INTEGER,
+                output_tokens INTEGER,
+                latency_seconds REAL,
+                cost_usd REAL,
+                created_at REAL NOT NULL
+            )
+        ''')
+        con.execute("CREATE INDEX IF NOT EXISTS idx_llm_calls_job ON llm_calls (job_id)")
+        con.execute("CREATE INDEX IF NOT EXISTS idx_llm_calls_created ON llm_calls (created_at)")
+
+
+# ---------------- Jobs (batched status writes) ----------------
+
+_pending = {}  # job_id -> fields waiting to be written
+_pending_lock = threading.Lock()
+_flush_now = threading.Event()
+_writer = None
+
+
+def save_job(job_id: str, status: str | None = None, **fields):
+    """
+    Queue an update for a job row (status and/or any column in JOB_COLUMNS).
+    Updates for the same job are merged and written in the next batch by a
+    background writer, so callers on the hot path never wait on the disk.
+    """
+    unknown = set(fields) - set(JOB_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown job fields: {sorted(unknown)}")
+    update = dict(fields)
+    if status is not None:
+        update["status"] = status
+    for column in JSON_JOB_COLUMNS:
+        if isinstance(update.get(column), dict):
+            update[column] = json.dumps(update[column])
+    update["updated_at"] = time.time()
+
+    with _pending_lock:
+        _pending.setdefault(job_id, {}).update(update)
+        pending_count = len(_pending)
+    _ensure_writer()
+    if pending_count >= STATUS_BATCH_MAX:
+        _flush_now.set()
+
+
+def flush_job_updates():
+    """Write all buffered job updates in one transaction."""
+    global _pending
+    with _pending_lock:
+        batch, _pending = _pending, {}
+    if not batch:
+        return
+
+    # Group rows by the set of columns they touch so each group is one executemany
+    groups = {}
+    for job_id, fields in batch.items():
+        columns = tuple(sorted(fields))
+        groups.setdefault(columns, []).append((job_id, *(fields[c] for c in columns)))
+
+    try:
+        con = get_connection()
+        with con:
+            for columns, rows in groups.items():
+                placeholders = ", ".join("?" for _ in range(len(columns) + 1))
+                assignments = ", ".join(f"{c} = excluded.{c}" for c in columns)
+                con.executemany(
+                    f"INSERT INTO jobs (id, {', '.join(columns)}) VALUES ({placeholders}) "
+                    f"ON CONFLICT(id) DO UPDATE SET {assignments}",
+                    rows,
+                )
+    except Exception:
+        # Put the batch back for the next cycle; updates buffered since then are newer and win
+        with _pending_lock:
+            for job_id, fields in batch.items():
+                _pending[job_id] = {**fields, **_pending.get(job_id, {})}
+        raise
+
+
+def _writer_loop():
+    while True:
+        _flush_now.wait(timeout=STATUS_BATCH_INTERVAL)
+        _flush_now.clear()
+        try:
+            flush_job_updates()
+        except Exception as e:
+            log.error(f"Failed to write job updates: {e}")
+
+
+def _ensure_writer():
+    global _writer
+    if _writer is None:
+        with _pending_lock:
+            if _writer is None:
+                _writer = threading.Thread(target=_writer_loop, name="job-status-writer", daemon=True)
+                _writer.start()
+
+
+atexit.register(flush_job_updates)
+
+
+def load_job_record(job_id: str):
+    """Full job row (including updates not yet flushed), or None."""
+    row = get_connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    record = dict(row) if row else None
+    with _pending_lock:
+        pending = dict(_pending.get(job_id, {}))
+    if pending:
+        record = {**(record or {"id": job_id}), **pending}
+    for column in JSON_JOB_COLUMNS:
+        if record and record.get(column):
+            record[column] = json.loads(record[column])
+    return record
+
+
+def load_job(job_id: str):
+    record = load_job_record(job_id)
+    return record.get("status") if record else None
+
+
+# ---------------- Evaluation outbox ----------------
+
+def enqueue_evaluation(job_id: str, evaluation_url: str, payload: dict,
+                       requested_at: float, deadline_at: float):
+    """Persist an evaluation submission so it survives restarts until delivered."""
+    con = get_connection()
+    with con:
+        con.execute(
+            """INSERT OR REPLACE INTO evaluation_outbox
+               (job_id, evaluation_url, payload, status, attempts,
+                requested_at, deadline_at, next_attempt_at)
+               VALUES (?, ?, ?, 'pending', 0, ?, ?, ?)""",
+            (job_id, evaluation_url, json.dumps(payload), requested_at, deadline_at, time.time()),
         )
-    ''')
-    con.commit()
 
 
-def save_job(job_id: str, status: str):
-    with sqlite3.connect(database_path) as con:
-        cur = con.cursor()  # create cursor for this connection!
-        cur.execute("INSERT OR REPLACE INTO jobs (id, status) VALUES (?, ?)", (job_id, status))
+def claim_due_evaluations(limit: int = 20, lease_seconds: float = 30.0):
+    """
+    Atomically claim pending submissions that are due (or whose lease expired
+    because the worker holding them died) and mark them as 'sending'.
+    Safe to call from several processes sharing the same database.
+    """
+    now = time.time()
+    con = get_connection()
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        rows = [dict(r) for r in con.execute(
+            """SELECT * FROM evaluation_outbox
+               WHERE (status = 'pending' AND next_attempt_at <= ?)
+                  OR (status = 'sending' AND lease_until < ?)
+               ORDER BY deadline_at
+               LIMIT ?""",
+            (now, now, limit),
+        )]
+        con.executemany(
+            "UPDATE evaluation_outbox SET status = 'sending', lease_until = ? WHERE job_id = ?",
+            [(now + lease_seconds, row["job_id"]) for row in rows],
+        )
         con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    for row in rows:
+        row["payload"] = json.loads(row["payload"])
+    return rows
 
 
-def load_job(job_id: str):
-    with sqlite3.connect(database_path) as con:
-        cur = con.cursor()  # create cursor for this connection!
-        cur.execute("SELECT status FROM jobs WHERE id=?", (job_id,))
-        row = cur.fetchone()
-        return row[0] if row else None
+def mark_evaluation_delivered(job_id: str, attempts: int):
+    con = get_connection()
+    with con:
+        con.execute(
+            """UPDATE evaluation_outbox
+               SET status = 'delivered', attempts = ?, delivered_at = ?, lease_until = NULL, last_error = NULL
+               WHERE job_id = ?""",
+            (attempts, time.time(), job_id),
+        )
+
+
+def reschedule_evaluation(job_id: str, attempts: int, next_attempt_at: float, error: str):
+    con = get_connection()
+    with con:
+        con.execute(
+            """UPDATE evaluation_outbox
+               SET status = 'pending', attempts = ?, next_attempt_at = ?, lease_until = NULL, last_error = ?
+               WHERE job_id = ?""",
+            (attempts, next_attempt_at, error, job_id),
+        )
+
+
+def mark_evaluation_failed(job_id: str, attempts: int, error: str):
+    con = get_connection()
+    with con:
+        con.execute(
+            """UPDATE evaluation_outbox
+               SET status = 'failed', attempts = ?, lease_until = NULL, last_error = ?
+               WHERE job_id = ?""",
+            (attempts, error, job_id),
+        )
+
+
+def load_evaluation_status(job_id: str):
+    row = get_connection().execute(
+        """SELECT job_id, status, attempts, requested_at, deadline_at,
+                  next_attempt_at, delivered_at, last_error
+           FROM evaluation_outbox WHERE job_id = ?""",
+        (job_id,),
+    ).fetchone()
+    return dict(row) if row else None
+
+
+# ---------------- Task rounds (shared by all workers) ----------------
+
+def register_task_round(task: str, round_number: int, job_id: str):
+    """Record `round_number` as the newest round seen for `task` (never moves backwards)."""
+    con = get_connection()
+    with con:
+        con.execute(
+            """INSERT INTO task_rounds (task, latest_round, latest_job_id, updated_at)
+               VALUES (?, ?, ?, ?)
+               ON CONFLICT(task) DO UPDATE SET
+                   latest_round = excluded.latest_round,
+                   latest_job_id = excluded.latest_job_id,
+                   updated_at = excluded.updated_at
+               WHERE excluded.latest_round >= task_rounds.latest_round""",
+            (task, round_number, job_id, time.time()),
+        )
+
+
+def load_latest_round(task: str):
+    row = get_connection().execute(
+        "SELECT latest_round FROM task_rounds WHERE task = ?", (task,)
+    ).fetchone()
+    return row[0] if row else None
+
+
+# ---------------- LLM call ledger ----------------
+
+# group_by name -> SQL expression; anything else is rejected
+LLM_USAGE_GROUPS = {
+    "task": "task",
+    "round": "round",
+    "model": "model",
+    "provider": "provider",
+    "day": "date(created_at, 'unixepoch')",
+}
+
+
+def record_llm_call(provider: str, outcome: str, job_id: str | None = None, task: str | None = None,
+                    round_number: int | None = None, model: str | None = None, input_tokens: int | None = None,
+                    cached_input_tokens: int | None = None, output_tokens: int | None = None,
+                    latency_seconds: float | None = None, cost_usd: float | None = None):
+    """Append one provider call; `attempt` counts the calls already recorded for the job."""
+    con = get_connection()
+    with con:
+        con.execute(
+            """INSERT INTO llm_calls
+               (job_id, task, round, provider, model, attempt, outcome, input_tokens, cached_input_tokens,
+                output_tokens, latency_seconds, cost_usd, created_at)
+               VALUES (?, ?, ?, ?, ?, (SELECT COUNT(*) + 1 FROM llm_calls WHERE job_id = ?),
+                       ?, ?, ?, ?, ?, ?, ?)""",
+            (job_id, task, round_number, provider, model, job_id, outcome, input_tokens, cached_input_tokens,
+             output_tokens, latency_seconds, cost_usd, time.time()),
+        )
+
+
+def load_llm_calls(job_id: str):
+    rows = get_connection().execute(
+        """SELECT provider, model, attempt, outcome, input_tokens, cached_input_tokens, output_tokens,
+                  latency_seconds, cost_usd, created_at
+           FROM llm_calls WHERE job_id = ? ORDER BY id""",
+        (job_id,),
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def llm_usage_summary(group_by=("task",), since: float | None = None, until: float | None = None):
+    """
+    Totals of the LLM call ledger grouped by any of LLM_USAGE_GROUPS
+    (e.g. ("task", "round") or ("model", "day")), optionally limited to a time range.
+    """
+    unknown = [g for g in group_by if g not in LLM_USAGE_GROUPS]
+    if unknown:
+        raise ValueError(f"Unknown group_by {unknown}; choose from {sorted(LLM_USAGE_GROUPS)}")
+    keys = ", ".join(f"{LLM_USAGE_GROUPS[g]} AS {g}" for g in group_by)
+    where, params = [], []
+    if since is not None:
+        where.append("created_at >= ?")
+        params.append(since)
+    if until is not None:
+        where.append("created_at < ?")
+        params.append(until)
+    rows = get_connection().execute(
+        f"""SELECT {keys + ',' if keys else ''}
+                   COUNT(*) AS calls,
+                   SUM(outcome != 'ok') AS errors,
+                   SUM(attempt > 1) AS retries,
+                   COUNT(DISTINCT job_id) AS jobs,
+                   COALESCE(SUM(input_tokens), 0) AS input_tokens,
+                   COALESCE(SUM(cached_input_tokens), 0) AS cached_input_tokens,
+                   COALESCE(SUM(output_tokens), 0) AS output_tokens,
+                   ROUND(COALESCE(SUM(cost_usd), 0), 6) AS cost_usd,
+                   ROUND(AVG(latency_seconds), 3) AS avg_latency_seconds,
+                   ROUND(MAX(latency_seconds), 3) AS max_latency_seconds
+            FROM llm_calls
+            {'WHERE ' + ' AND '.join(where) if where else ''}
+            {'GROUP BY ' + ', '.join(group_by) + ' ORDER BY ' + ', '.join(group_by) if group_by else ''}""",
+        params,
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+
+# ---------------- Retention / compaction ----------------
+
+def compact_database(retention_days: float = RETENTION_DAYS):
+    """
+    Delete finished rows older than `retention_days` (queued or running jobs
+    are kept however old they are), then checkpoint the WAL
+    and release free pages so the database file stays small.
+    """
+    flush_job_updates()
+    cutoff = time.time() - retention_days * 86400
+    con = get_connection()
+    with con:
+        jobs = con.execute(
+            f"DELETE FROM jobs WHERE status IN ({', '.join('?' for _ in FINISHED_JOB_STATUSES)}) AND updated_at < ?",
+            (*FINISHED_JOB_STATUSES, cutoff),
+        ).rowcount
+        outbox = con.execute(
+            "DELETE FROM evaluation_outbox WHERE status IN ('delivered', 'failed') AND requested_at < ?",
+            (cutoff,),
+        ).rowcount
+        rounds = con.execute("DELETE FROM task_rounds WHERE updated_at < ?", (cutoff,)).rowcount
+        contexts = con.execute("DELETE FROM context_rounds WHERE created_at < ?", (cutoff,)).rowcount
+        llm_calls = con.execute("DELETE FROM llm_calls WHERE created_at < ?", (cutoff,)).rowcount
+        con.execute(
+            """DELETE FROM context_files WHERE NOT EXISTS (
+                   SELECT 1 FROM context_rounds r
+                   WHERE r.task = context_files.task AND r.round = context_files.round)"""
+        )
+        con.execute(
+            """DELETE FROM context_blobs
+               WHERE NOT EXISTS (SELECT 1 FROM context_files WHERE blob_hash = context_blobs.hash)
+                 AND NOT EXISTS (SELECT 1 FROM context_rounds WHERE raw_hash = context_blobs.hash)"""
+        )
+    con.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    con.execute("PRAGMA incremental_vacuum")
+    log.info(f"Compacted database: removed {jobs} jobs, {outbox} outbox rows, {rounds} task rounds, "
+             f"{contexts} context rounds, {llm_calls} LLM calls.")
+
+
+class _Maintenance:
+    """Background thread running compact_database (and any added tasks) periodically."""
+
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread = None
+        self._tasks = []
+
+    def add_task(self, callback):
+        """Also run `callback()` on every maintenance pass (added once, however often this is called)."""
+        if callback not in self._tasks:
+            self._tasks.append(callback)
+
+    def start(self, interval: float = COMPACT_INTERVAL_SECONDS):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="db-maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+        flush_job_updates()
+
+    def _run(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                compact_database()
+            except Exception as e:
+                log.error(f"Database compaction failed: {e}")
+            for callback in self._tasks:
+                try:
+                    callback()
+                except Exception as e:
+                    log.error(f"Maintenance task {callback.__name__} failed: {e}")
+
+
+maintenance = _Maintenance()
@@ -1 +1 @@
-from .logger import get_logger
\ No newline at end of file
+from .logger import get_logger, log_context, set_log_context, get_log_context, setup_logging
@@ -1,32 +1,184 @@
-import logging
 import os
-from logging.handlers import RotatingFileHandler
+import copy
+import json
+import time
+import queue
+import atexit
+import random
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 
-# --- Ensure logs directory exists ---
+# --- Log file paths (the directory and files are created by setup_logging) ---
 LOG_DIR = os.path.join(os.getcwd(), "logs")
-os.makedirs(LOG_DIR, exist_ok=True)
-
-# --- Define log file paths ---
 app_log_file = os.path.join(LOG_DIR, "app.log")
 error_log_file = os.path.join(LOG_DIR, "error.log")
 
+# --- Settings ---
+# LOG_FORMAT: "json" (one JSON object per line) or "text"
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Per-module levels, e.g. "app.services.github_service_2=WARNING,app.utils=DEBUG"
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+# Per-module sampling of records below WARNING, e.g. "app.services.llm_service=0.1"
+LOG_SAMPLING = os.getenv("LOG_SAMPLING", "")
+# Long messages (XML snippets, API error bodies) are cut to this many characters
+LOG_MAX_MESSAGE_CHARS = int(os.getenv("LOG_MAX_MESSAGE_CHARS", 2000))
+
+# Fields attached to every record logged while a job is running
+CONTEXT_FIELDS = ("job_id", "task", "round", "stage")
+_log_context = contextvars.ContextVar("log_context", default={})
+
+
+@contextmanager
+def log_context(**fields):
+    """Attach job_id/task/round/stage to every record logged inside the block."""
+    token = _log_context.set({**_log_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+
+def set_log_context(**fields):
+    """Update fields (e.g. the current stage) inside an enclosing log_context block."""
+    _log_context.set({**_log_context.get(), **fields})
+
+
+def get_log_context() -> dict:
+    """Fields of the enclosing log_context block (empty outside one)."""
+    return dict(_log_context.get())
+
+
+def _parse_mapping(spec: str) -> dict:
+    mapping = {}
+    for item in spec.split(","):
+        if "=" in item:
+            key, value = item.split("=", 1)
+            mapping[key.strip()] = value.strip()
+    return mapping
+
+
+class ContextFilter(logging.Filter):
+    """
+    Runs on the calling thread before the record is queued:
+    copies the job context onto the record, applies per-module sampling and
+    truncates oversized messages.
+    """
+
+    def __init__(self, sampling: dict):
+        super().__init__()
+        self.sampling = sorted(((k, float(v)) for k, v in sampling.items()), key=lambda kv: -len(kv[0]))
+
+    def _rate(self, name: str) -> float:
+        for prefix, rate in self.sampling:
+            if name == prefix or name.startswith(prefix + "."):
+                return rate
+        return 1.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING and self.sampling:
+            rate = self._rate(record.name)
+            if rate < 1.0 and random.random() >= rate:
+                return False
+
+        context = _log_context.get()
+        for field in CONTEXT_FIELDS:
+            setattr(record, field, context.get(field))
+
+        message = record.getMessage()
+        if len(message) > LOG_MAX_MESSAGE_CHARS:
+            message = message[:LOG_MAX_MESSAGE_CHARS] + f"... [truncated {len(message) - LOG_MAX_MESSAGE_CHARS} chars]"
+        record.msg, record.args = message, None
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with the job context fields when present."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class JobQueueHandler(QueueHandler):
+    """
+    Queue handler that keeps the traceback as text instead of folding it into the message.
+    The first record it sees starts the file writer if setup_logging() hasn't run yet.
+    """
+
+    def emit(self, record: logging.LogRecord):
+        if listener is None:
+            setup_logging()
+        super().emit(record)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
 # --- Define log format ---
-formatter = logging.Formatter(
-    "%(asctime)s | %(levelname)s | %(name)s | %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S"
-)
+if LOG_FORMAT == "json":
+    formatter = JsonFormatter()
+else:
+    formatter = logging.Formatter(
+        "%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S"
+    )
+
+# --- Records are handed to a background writer through an unbounded queue ---
+log_queue = queue.SimpleQueue()
+queue_handler = JobQueueHandler(log_queue)
+queue_handler.addFilter(ContextFilter(_parse_mapping(LOG_SAMPLING)))
+listener = None
+_setup_lock = threading.Lock()
+
 
-# --- Create file handlers ---
-app_handler = RotatingFileHandler(app_log_file, maxBytes=5_000_000, backupCount=3)
-app_handler.setFormatter(formatter)
-app_handler.setLevel(logging.INFO)
+def setup_logging():
+    """
+    Create logs/ and the rotating file handlers and start the writer thread.
+    Called from the app's lifespan hook; safe to call more than once.
+    """
+    global listener
+    with _setup_lock:
+        if listener is not None:
+            return
+        os.makedirs(LOG_DIR, exist_ok=True)
 
-error_handler = RotatingFileHandler(error_log_file, maxBytes=5_000_000, backupCount=3)
-error_handler.setFormatter(formatter)
-error_handler.setLevel(logging.ERROR)
+        # --- File handlers run on the listener thread, never on request/job threads ---
+        app_handler = RotatingFileHandler(app_log_file, maxBytes=5_000_000, backupCount=3)
+        app_handler.setFormatter(formatter)
+        app_handler.setLevel(LOG_LEVEL)
 
-# --- Configure root logger ---
-logging.basicConfig(level=logging.INFO, handlers=[app_handler, error_handler])
+        error_handler = RotatingFileHandler(error_log_file, maxBytes=5_000_000, backupCount=3)
+        error_handler.setFormatter(formatter)
+        error_handler.setLevel(logging.ERROR)
+
+        listener = QueueListener(log_queue, app_handler, error_handler, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+
+
+# --- Configure root logger (no I/O: records wait in the queue until the writer starts) ---
+logging.basicConfig(level=LOG_LEVEL, handlers=[queue_handler])
+for module, level in _parse_mapping(LOG_LEVELS).items():
+    logging.getLogger(module).setLevel(level.upper())
 
 # --- Silence uvicorn internal spam, keep request logs visible ---
 logging.getLogger("uvicorn.error").propagate = False
@@ -35,7 +187,3 @@ logging.getLogger("uvicorn.access").addHandler(logging.StreamHandler())
 def get_logger(name: str):
     """Return a logger for a specific module."""
     return logging.getLogger(name)
-
-# --- Force log files to be created immediately ---
-_ = get_logger(__name__)
-logging.info("Log system initialized and files ensured.")
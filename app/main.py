@@ -1,11 +1,30 @@
 import os
+import json
+import time
 import uuid
-from fastapi import FastAPI, BackgroundTasks, HTTPException, Response
-from app.utils import check_secret
+import asyncio
+import importlib
+import tempfile
+import threading
+from contextlib import asynccontextmanager
+from pydantic import ValidationError
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import PlainTextResponse
+from app.utils import check_secret, record_request, sweep_orphans, sweep_workspaces, REQUEST_LOG_PATH, spill_attachments, \
+    sweep_attachments, PayloadTooLarge, MAX_REQUEST_BYTES
 from app.model import User_json
 from dotenv import load_dotenv
 from app.background import build_and_deploy
-from app.logger import get_logger
+from app.database import load_evaluation_status, load_job_record, save_job, maintenance, init_db, load_llm_calls, \
+    llm_usage_summary
+from app.services.evaluation_service import dispatcher
+from app.services.job_queue import job_queue
+from app.services.task_coordinator import coordinator
+from app.utils.deadline import Deadline
+from app.logger import get_logger, setup_logging
+from app.metrics import registry
+from app.cpu import warm_cpu_pool, shutdown_cpu_pool
 
 
 load_dotenv()
@@ -13,19 +32,164 @@ load_dotenv()
 
 log = get_logger(__name__)
 
+# Modules too slow to import at startup; loaded in the background once the app is serving
+PREWARM_IMPORTS = os.getenv("PREWARM_IMPORTS", "1").lower() in ("1", "true", "yes")
+PREWARM_MODULES = ("app.services.github_service_2", "httpx", "huggingface_hub")
 
-app = FastAPI()
+# Request bodies above this size are buffered on disk instead of in memory
+REQUEST_SPOOL_BYTES = int(os.getenv("REQUEST_SPOOL_BYTES", 1024 * 1024))
 
 
+def _prewarm():
+    for module in PREWARM_MODULES:
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            log.warning(f"Prewarm of {module} failed: {e}")
+    try:
+        warm_cpu_pool()
+    except Exception as e:
+        log.warning(f"Prewarm of the CPU pool failed: {e}")
 
-@app.post("/api/generate-app")
-async def generate_app(data:User_json,background_tasks:BackgroundTasks):
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Step 1: I/O that used to run at import time
+    setup_logging()
+    init_db()
+
+    # Step 2: Background workers
+    job_queue.start()
+    # Idle task workspaces are removed on every maintenance pass
+    maintenance.add_task(sweep_workspaces)
+    maintenance.start()
+    await dispatcher.start()
+    # Workspace trees and attachments left behind by a crash are deleted in the background
+    threading.Thread(target=sweep_orphans, name="workspace-sweep", daemon=True).start()
+    threading.Thread(target=sweep_attachments, name="attachment-sweep", daemon=True).start()
+
+    # Step 3: Load the heavy SDKs off the startup path so the first job doesn't pay for them
+    if PREWARM_IMPORTS:
+        threading.Thread(target=_prewarm, name="prewarm", daemon=True).start()
+
+    yield
+
+    job_queue.stop()
+    maintenance.stop()
+    await dispatcher.stop()
+    shutdown_cpu_pool()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+
+async def _read_body(request: Request):
+    """Stream the request body into a spooled temp file, enforcing MAX_REQUEST_BYTES."""
+    too_large = HTTPException(status_code=413, detail=f"Request body is larger than {MAX_REQUEST_BYTES} bytes")
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > MAX_REQUEST_BYTES:
+        raise too_large
+    body = tempfile.SpooledTemporaryFile(max_size=REQUEST_SPOOL_BYTES)
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > MAX_REQUEST_BYTES:
+            body.close()
+            raise too_large
+        body.write(chunk)
+    body.seek(0)
+    return body
+
+
+def _parse_body(body) -> User_json:
+    """
+    Decode and validate the whole body at once (not incrementally): a request
+    briefly holds a few times its size in memory, bounded by MAX_REQUEST_BYTES.
+    """
+    with body:
+        try:
+            payload = json.load(body)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Request body is not valid JSON")
+    try:
+        return User_json.model_validate(payload)
+    except ValidationError as e:
+        # Same error shape FastAPI gives for a declared body parameter
+        raise RequestValidationError([{**error, "loc": ("body", *error["loc"])}
+                                      for error in e.errors(include_url=False)])
+
+
+def _spill(data: User_json, job_id: str, received_at: float) -> User_json:
+    """Record the request if enabled, then swap its attachments for on-disk references."""
+    if REQUEST_LOG_PATH:
+        record_request(data.model_dump(), received_at)
+    try:
+        refs = spill_attachments(job_id, data.attachments)
+    except PayloadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return data.model_copy(update={"attachments": refs})
+
+
+@app.post("/api/generate-app", openapi_extra={"requestBody": {
+    "required": True, "content": {"application/json": {"schema": User_json.model_json_schema()}}}})
+async def generate_app(request: Request):
+    received_at = time.time()
     log.info("Received request to generate app.")
+    # The body is received with a size cap and parsed off the event loop
+    data = await asyncio.to_thread(_parse_body, await _read_body(request))
+
     log.info("Checking secret...")
     if not check_secret(data.secret, os.getenv("SECRET_KEY")):
         raise HTTPException(status_code=401, detail="Invalid secret")
-    
+
     job_id = str(uuid.uuid4())
-    log.info(f"Starting background task for job_id: {job_id}")
-    background_tasks.add_task(build_and_deploy, data, job_id)
-    return Response(status_code=200)
+    # The queued job only holds references to its attachments, not their contents
+    data = await asyncio.to_thread(_spill, data, job_id, received_at)
+
+    log.info(f"Queueing job_id: {job_id}")
+    # Newer rounds make queued or running older rounds of the same task obsolete
+    # (a SQLite write that may wait on the busy timeout, so off the event loop)
+    await asyncio.to_thread(coordinator.register, data.task, data.round, job_id)
+    save_job(job_id, "queued", task=data.task, round=data.round, email=data.email, created_at=received_at)
+    # Jobs run earliest-deadline-first; rounds of one task run one at a time
+    job_queue.submit(Deadline.from_start(received_at), build_and_deploy, data, job_id, received_at, task=data.task)
+    return {"job_id": job_id}
+
+
+@app.get("/api/jobs/{job_id}/evaluation")
+async def evaluation_status(job_id: str):
+    status = await asyncio.to_thread(load_evaluation_status, job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="No evaluation submission for this job")
+    return status
+
+
+@app.get("/api/jobs/{job_id}")
+async def job_status(job_id: str):
+    record = await asyncio.to_thread(load_job_record, job_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    record["llm_calls"] = await asyncio.to_thread(load_llm_calls, job_id)
+    return record
+
+
+@app.get("/api/usage")
+async def llm_usage(group_by: str = "task", since: float | None = None, until: float | None = None):
+    """
+    LLM calls, tokens, cost and latency from the ledger, grouped by a
+    comma-separated list of task, round, model, provider and day
+    (e.g. ?group_by=task,round or ?group_by=model,day&since=<unix time>).
+    """
+    groups = [g.strip() for g in group_by.split(",") if g.strip()]
+    try:
+        rows = await asyncio.to_thread(llm_usage_summary, groups, since, until)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"group_by": groups, "rows": rows}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus scrape endpoint."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
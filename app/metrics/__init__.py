@@ -0,0 +1,13 @@
+from .registry import registry, Counter, Gauge, Histogram
+from .pipeline_metrics import (
+    STAGE_SECONDS,
+    JOB_SECONDS,
+    JOBS_TOTAL,
+    QUEUE_DEPTH,
+    JOBS_IN_FLIGHT,
+    LLM_SECONDS,
+    LLM_RESPONSE_BYTES,
+    GITHUB_CALLS,
+    GITHUB_SECONDS,
+    EVALUATION_ATTEMPTS,
+)
\ No newline at end of file
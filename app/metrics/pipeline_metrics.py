@@ -0,0 +1,35 @@
+from .registry import registry, BYTES_BUCKETS
+
+# --- build_and_deploy ---
+STAGE_SECONDS = registry.histogram(
+    "pipeline_stage_seconds", "Duration of each build_and_deploy stage.", ["stage"]
+)
+JOB_SECONDS = registry.histogram(
+    "pipeline_job_seconds", "Time from request receipt to the evaluation being queued.", ["outcome"]
+)
+JOBS_TOTAL = registry.counter(
+    "pipeline_jobs_total", "Jobs finished, by outcome.", ["outcome"]
+)
+QUEUE_DEPTH = registry.gauge("job_queue_depth", "Jobs waiting to run (queued, parked or retrying).")
+JOBS_IN_FLIGHT = registry.gauge("jobs_in_flight", "Jobs currently running on a worker thread.")
+
+# --- LLM providers ---
+LLM_SECONDS = registry.histogram(
+    "llm_request_seconds", "Latency of LLM provider calls.", ["provider", "outcome"]
+)
+LLM_RESPONSE_BYTES = registry.histogram(
+    "llm_response_bytes", "Size of LLM responses.", ["provider"], buckets=BYTES_BUCKETS
+)
+
+# --- GitHub ---
+GITHUB_CALLS = registry.counter(
+    "github_api_calls_total", "GitHub API calls by endpoint and HTTP status.", ["endpoint", "status"]
+)
+GITHUB_SECONDS = registry.histogram(
+    "github_api_call_seconds", "Latency of GitHub API calls.", ["endpoint"]
+)
+
+# --- Evaluation submissions ---
+EVALUATION_ATTEMPTS = registry.counter(
+    "evaluation_attempts_total", "Evaluation submission attempts by outcome.", ["outcome"]
+)
@@ -12,3 +12,5 @@ class User_json(BaseModel):
     checks: List[str]
     evaluation_url: str
     attachments: List
+    # Run this job under cProfile/tracemalloc (see app.tracing.profiling)
+    profile: bool = False
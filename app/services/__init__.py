@@ -1,6 +1,8 @@
-from .llm_service import build_prompt,build_prompt_xml,save_llm_output,save_llm_output_xml
+from .llm_service import build_prompt,build_prompt_xml,save_llm_output,save_llm_output_xml,parse_llm_output_xml
+from .prompt_templates import PROMPT_TEMPLATE_VERSION, static_prefix, prefix_sha256
 from .github_service import push_to_github
 from .aipipe import ask_aipipe
 from .hugging_face import ask_hugging_face
-from .evaluation_service import post_evaluation
+from .evaluation_service import submit_evaluation
 
+from .model_router import route_job
@@ -1,20 +1,50 @@
+import os
+import time
 import requests
+from app.metrics import LLM_SECONDS, LLM_RESPONSE_BYTES
+from app.tracing import span
+from app.services.llm_ledger import record_call
 
+# Responses endpoint; overridable to point at a local stub (see benchmarks/)
+AIPIPE_URL = os.getenv("AIPIPE_URL", "https://aipipe.org/openai/v1/responses")
 
-def ask_aipipe(input_prompt:str,aipipe_token,model="gpt-4.1"):
+
+def ask_aipipe(input_prompt:str,aipipe_token,model="gpt-4.1",timeout=None,cache_key=None):
     if not aipipe_token:
         raise RuntimeError("AIPIPE_TOKEN not found please provide token.")
 
+    start = time.time()
+    outcome = "error"
+    usage = {}
+    with span("llm.aipipe", model=model) as attrs:
+        try:
+            text, usage = _post_aipipe(input_prompt, aipipe_token, model, timeout, cache_key)
+            outcome = "ok"
+            attrs["response_bytes"] = len(text.encode("utf-8"))
+            LLM_RESPONSE_BYTES.observe(attrs["response_bytes"], provider="aipipe")
+            return text
+        finally:
+            latency = time.time() - start
+            LLM_SECONDS.observe(latency, provider="aipipe", outcome=outcome)
+            record_call("aipipe", model, outcome, latency,
+                        input_tokens=usage.get("input_tokens"),
+                        cached_input_tokens=(usage.get("input_tokens_details") or {}).get("cached_tokens"),
+                        output_tokens=usage.get("output_tokens"))
+
+
+def _post_aipipe(input_prompt, aipipe_token, model, timeout, cache_key=None):
+    body = {"model": model, "input": input_prompt}
+    # Routes requests sharing a prompt prefix to the same cache
+    if cache_key:
+        body["prompt_cache_key"] = cache_key
     response = requests.post(
-        "https://aipipe.org/openai/v1/responses",
+        AIPIPE_URL,
         headers={
                 "Authorization": f"Bearer {aipipe_token}",
                 "Content-Type": "application/json"
                 },
-        json={
-                "model": model,
-                "input": input_prompt
-                }
+        json=body,
+        timeout=timeout
     )
 
     # Raise an exception if request failed
@@ -23,4 +53,4 @@ def ask_aipipe(input_prompt:str,aipipe_token,model="gpt-4.1"):
     # Parse JSON
     data = response.json()
 
-    return data["output"][0]["content"][0]["text"]
\ No newline at end of file
+    return data["output"][0]["content"][0]["text"], data.get("usage") or {}
\ No newline at end of file
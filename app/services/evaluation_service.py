@@ -1,46 +1,145 @@
+import os
 import time
-import requests
+import random
+import asyncio
+from urllib.parse import urlsplit
 from app.logger import get_logger
+from app.metrics import EVALUATION_ATTEMPTS
+from app.database import (
+    enqueue_evaluation,
+    claim_due_evaluations,
+    mark_evaluation_delivered,
+    reschedule_evaluation,
+    mark_evaluation_failed,
+)
 
 log = get_logger(__name__)
 
-def post_evaluation(evaluation_url: str, payload: dict, max_total_seconds: int = 600):
+# Total time allowed from request receipt to a successful submission
+EVALUATION_DEADLINE_SECONDS = int(os.getenv("EVALUATION_DEADLINE_SECONDS", 600))
+EVALUATION_POLL_SECONDS = float(os.getenv("EVALUATION_POLL_SECONDS", 1.0))
+EVALUATION_BACKOFF_BASE = 1.0
+EVALUATION_BACKOFF_CAP = 120.0
+
+
+def submit_evaluation(job_id: str, evaluation_url: str, payload: dict, requested_at: float):
     """
-    Send task result to evaluation URL with exponential backoff,
-    ensuring the total process (all retries + delays) completes within `max_total_seconds`.
+    Write the submission to the persistent outbox and wake the dispatcher.
+    Returns immediately; delivery happens on the dispatcher's event loop.
     """
-    start_time = time.time()
-    delay = 1  # initial backoff delay (1s)
-    attempt = 0
+    enqueue_evaluation(
+        job_id=job_id,
+        evaluation_url=evaluation_url,
+        payload=payload,
+        requested_at=requested_at,
+        deadline_at=requested_at + EVALUATION_DEADLINE_SECONDS,
+    )
+    log.info(f"Queued evaluation submission for job {job_id}")
+    dispatcher.notify()
 
-    while True:
-        attempt += 1
-        try:
-            response = requests.post(
-                evaluation_url,
-                json=payload,
+
+def _backoff_delay(attempts: int) -> float:
+    """Exponential backoff with full jitter."""
+    ceiling = min(EVALUATION_BACKOFF_BASE * (2 ** (attempts - 1)), EVALUATION_BACKOFF_CAP)
+    return random.uniform(EVALUATION_BACKOFF_BASE / 2, ceiling)
+
+
+class EvaluationDispatcher:
+    """
+    Async worker that drains the evaluation outbox.
+    Keeps one keep-alive httpx client per evaluation host so retries and
+    submissions to the same evaluator reuse their connections.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._wakeup = None
+        self._task = None
+        self._clients = {}
+
+    def _client_for(self, url: str):
+        host = urlsplit(url).netloc
+        client = self._clients.get(host)
+        if client is None:
+            import httpx  # loaded on the first delivery, not at startup
+            client = httpx.AsyncClient(
+                timeout=10,
                 headers={"Content-Type": "application/json"},
-                timeout=10
+                limits=httpx.Limits(max_keepalive_connections=5, keepalive_expiry=60),
+            )
+            self._clients[host] = client
+        return client
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        log.info("Evaluation dispatcher started.")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+        log.info("Evaluation dispatcher stopped.")
+
+    def notify(self):
+        """Thread-safe wake-up, called from build workers after enqueueing."""
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _run(self):
+        while True:
+            try:
+                rows = await asyncio.to_thread(claim_due_evaluations)
+                if rows:
+                    await asyncio.gather(*(self._deliver(row) for row in rows))
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.info(f"Evaluation dispatcher error: {e}")
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=EVALUATION_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _deliver(self, row: dict):
+        job_id = row["job_id"]
+        attempts = row["attempts"] + 1
+        error = None
+        try:
+            response = await self._client_for(row["evaluation_url"]).post(
+                row["evaluation_url"], json=row["payload"]
             )
             if response.status_code == 200:
-                log.info("Successfully submitted to evaluation endpoint!")
-                return True
-            else:
-                log.info(f"Attempt {attempt}: HTTP {response.status_code} — {response.text[:200]}")
+                EVALUATION_ATTEMPTS.inc(outcome="delivered")
+                log.info(f"Job {job_id}: submitted to evaluation endpoint (attempt {attempts}).")
+                await asyncio.to_thread(mark_evaluation_delivered, job_id, attempts)
+                return
+            EVALUATION_ATTEMPTS.inc(outcome="http_error")
+            error = f"HTTP {response.status_code} — {response.text[:200]}"
         except Exception as e:
-            log.info(f"Attempt {attempt}: Exception — {e}")
-
-        # check remaining time
-        elapsed = time.time() - start_time
-        remaining = max_total_seconds - elapsed
+            EVALUATION_ATTEMPTS.inc(outcome="exception")
+            error = f"Exception — {e}"
+        log.info(f"Job {job_id} attempt {attempts}: {error}")
 
+        # Schedule the next attempt within the deadline counted from the original request
+        now = time.time()
+        remaining = row["deadline_at"] - now
         if remaining <= 0:
-            log.info("Failed to submit within 10 minutes (time limit reached)")
-            return False
+            log.info(f"Job {job_id}: failed to submit within deadline (time limit reached)")
+            await asyncio.to_thread(mark_evaluation_failed, job_id, attempts, error)
+            return
+        next_attempt_at = now + min(_backoff_delay(attempts), remaining)
+        await asyncio.to_thread(reschedule_evaluation, job_id, attempts, next_attempt_at, error)
 
-        # Adjust delay to never exceed remaining time
-        next_delay = min(delay, remaining)
-        log.info(f"Retrying in {next_delay:.1f}s... (elapsed: {elapsed:.1f}s)")
-        time.sleep(next_delay)
 
-        delay = min(delay * 2, 120)  # exponential backoff capped at 2 minutes
+dispatcher = EvaluationDispatcher()
@@ -1,6 +1,7 @@
-import os, base64, requests
-from typing import Dict, Any, List
+import os, requests
+from typing import Dict, Any
 from app.logger import get_logger
+from app.utils.file_collector import iter_workspace_files, read_file_base64
 
 log = get_logger(__name__)
 
@@ -21,11 +22,10 @@ def create_repo(repo_name):
     else:
         raise Exception(resp.json())    
 
-def commit_file(repo_name, file_path, content_bytes, commit_msg):
+def commit_file(repo_name, file_path, content_b64, commit_msg):
     log.info("commit started")
     url = f"https://api.github.com/repos/{OWNER}/{repo_name}/contents/{file_path}"
     headers = {"Authorization": f"Bearer {GITHUB_TOKEN}"}
-    content_b64 = base64.b64encode(content_bytes).decode()
     data = {"message": commit_msg, "content": content_b64}
 
     # check if file exists to include SHA for update
@@ -71,8 +71,8 @@ def handle_round(task_id, round_number, generated_files):
     # Commit all files
     sha_dict = {}
     for file in generated_files:
-        path, content = file["path"], file["content"].encode("utf-8")
-        sha = commit_file(repo_name, path, content, f"Round {round_number} commit")
+        path = file["path"]
+        sha = commit_file(repo_name, path, read_file_base64(file["abs_path"]), f"Round {round_number} commit")
         sha_dict[path] = sha
 
     return {"repo": repo_name, "commit_shas": sha_dict, "pages_url": pages_url if round_number==1 else None}
@@ -92,20 +92,8 @@ def push_to_github(task_id: str, round_number: int, base_dir: str = "generated_a
         Dict[str, Any]: Response from handle_round API with commit SHAs, repo name, and Pages URL.
     """
 
-    # Step 1: Read all files from the generated app folder
-    generated_files: List[Dict[str, str]] = []
-    for root, dirs, files in os.walk(base_dir):
-        for f in files:
-            file_path = os.path.join(root, f)
-            rel_path = os.path.relpath(file_path, base_dir)  # relative to repo root
-            with open(file_path, "rb") as file_obj:
-                try:
-                    content = file_obj.read().decode("utf-8")
-                except UnicodeDecodeError:
-                    # for binary files like images
-                    import base64
-                    content = base64.b64encode(file_obj.read()).decode("utf-8")
-            generated_files.append({"path": rel_path, "content": content})
+    # Step 1: Lazily collect files from the generated app folder
+    generated_files = iter_workspace_files(base_dir)
 
     # Step 2: Build dynamic repo name based on task ID
     repo_name = f"task-{task_id}"
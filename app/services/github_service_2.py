@@ -1,12 +1,15 @@
 import os
-import base64
 from github import Github, GithubException
 from github import InputGitTreeElement
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Iterable
 from dotenv import load_dotenv
 import requests
 import time
 from app.logger import get_logger
+from app.metrics import GITHUB_CALLS, GITHUB_SECONDS
+from app.tracing import span
+from app.utils.file_collector import iter_workspace_files, read_file_base64, read_file_text
+from app.cpu import offload
 
 log = get_logger(__name__)
 
@@ -15,18 +18,95 @@ load_dotenv()
 # Environment Variables
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 OWNER = os.getenv("GITHUB_USERNAME")
-
-# Authenticate once
-g = Github(GITHUB_TOKEN)
-user = g.get_user()
+# REST API root; point it at a GitHub Enterprise host or a local stub (see benchmarks/)
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+
+# Upper bound for a single GitHub API call; shrinks further as a job's deadline nears
+GITHUB_TIMEOUT_SECONDS = int(os.getenv("GITHUB_TIMEOUT_SECONDS", 15))
+
+# Shared client, created on first use
+_default_client = None
+
+
+def repo_name_for(task_id: str) -> str:
+    """Repository name used for a task (same cleaning as push_to_github)."""
+    return f"task-{task_id.replace(' ', '_').strip()}"
+
+
+def pages_url_for(repo_name: str) -> str:
+    return f"https://{OWNER}.github.io/{repo_name}/"
+
+
+def _github() -> Github:
+    global _default_client
+    if _default_client is None:
+        _default_client = Github(GITHUB_TOKEN, base_url=GITHUB_API_URL, timeout=GITHUB_TIMEOUT_SECONDS)
+    return _default_client
+
+
+def _client(deadline=None):
+    """GitHub client whose request timeout fits in the job's remaining time."""
+    if deadline is None:
+        return _github()
+    return Github(GITHUB_TOKEN, base_url=GITHUB_API_URL, timeout=int(deadline.timeout(cap=GITHUB_TIMEOUT_SECONDS)))
+
+
+def _request_timeout(deadline=None) -> float:
+    if deadline is None:
+        return GITHUB_TIMEOUT_SECONDS
+    return deadline.timeout(cap=GITHUB_TIMEOUT_SECONDS)
+
+
+def _github_call(endpoint: str, fn, *args, **kwargs):
+    """Run a PyGithub call, recording it by endpoint and status (PyGithub hides 2xx codes)."""
+    start = time.time()
+    status = "2xx"
+    with span(f"github.{endpoint}") as attrs:
+        try:
+            return fn(*args, **kwargs)
+        except GithubException as e:
+            status = str(e.status)
+            raise
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            attrs["status"] = status
+            GITHUB_CALLS.inc(endpoint=endpoint, status=status)
+            GITHUB_SECONDS.observe(time.time() - start, endpoint=endpoint)
+
+
+def _github_request(endpoint: str, method: str, url: str, **kwargs):
+    """requests call to the GitHub REST API, recorded like _github_call."""
+    start = time.time()
+    status = "error"
+    with span(f"github.{endpoint}") as attrs:
+        try:
+            response = requests.request(method, url, **kwargs)
+            status = str(response.status_code)
+            return response
+        finally:
+            attrs["status"] = status
+            GITHUB_CALLS.inc(endpoint=endpoint, status=status)
+            GITHUB_SECONDS.observe(time.time() - start, endpoint=endpoint)
+
+
+def _sleep(seconds: float, deadline=None):
+    if deadline is None:
+        time.sleep(seconds)
+    else:
+        deadline.sleep(seconds)
 
 
-def create_repo(repo_name: str):
+def create_repo(repo_name: str, client=None):
     log.info(f"Creating repository: {repo_name}")
     # log.info("TOKEN:", GITHUB_TOKEN[:8], "...", "OWNER:", OWNER)
+    client = client or _github()
 
     try:
-        repo = user.create_repo(
+        repo = _github_call(
+            "create_repo",
+            client.get_user().create_repo,
             name=repo_name,
             private=False,
             auto_init=True,
@@ -37,7 +117,7 @@ def create_repo(repo_name: str):
     except GithubException as e:
         if e.status == 422:  # repo already exists
             log.info("Repo already exists.")
-            return g.get_repo(f"{OWNER}/{repo_name}")
+            return _github_call("get_repo", client.get_repo, f"{OWNER}/{repo_name}")
         else:
             raise e
 
@@ -94,32 +174,46 @@ def commit_all_files_single_sha(repo, files: list, commit_msg: str):
 
 
 
-def enable_github_pages(repo_name, token, owner):
+def enable_github_pages(repo_name, token, owner, deadline=None, main_ready=False):
     """
     Enables GitHub Pages for a repo using REST API (2025 method).
     Works after initial commits are pushed to 'main'.
+    Does nothing but return the URL when Pages is already enabled, so any
+    round can call it (round 1 may have been superseded before enabling it).
+    Waits and request timeouts are trimmed to the job's `deadline` when given.
+    `main_ready` skips the branch check when provisioning already confirmed it.
     """
     headers = {
         "Authorization": f"token {token}",
         "Accept": "application/vnd.github+json",
     }
+    final_url = f"https://{owner}.github.io/{repo_name}/"
+    pages_url = f"{GITHUB_API_URL}/repos/{owner}/{repo_name}/pages"
+
+    # Step 0: Check whether Pages is already enabled
+    r = _github_request("get_pages", "GET", pages_url, headers=headers, timeout=_request_timeout(deadline))
+    if r.status_code == 200:
+        log.info(f"GitHub Pages already enabled: {final_url}")
+        return final_url
+    if r.status_code != 404:
+        log.info(f"Could not read GitHub Pages status ({r.status_code}), trying to enable it.")
 
     # Step 1: Check if repo exists and has main branch
-    repo_url = f"https://api.github.com/repos/{owner}/{repo_name}/branches/main"
-    r = requests.get(repo_url, headers=headers)
-    if r.status_code != 200:
-        log.info("'main' branch not found. Retrying in 5s...")
-        time.sleep(5)
-        r = requests.get(repo_url, headers=headers)
+    if not main_ready:
+        repo_url = f"{GITHUB_API_URL}/repos/{owner}/{repo_name}/branches/main"
+        r = _github_request("get_branch", "GET", repo_url, headers=headers, timeout=_request_timeout(deadline))
         if r.status_code != 200:
-            log.info(f"Could not find main branch: {r.status_code} {r.text}")
-            return None
+            log.info("'main' branch not found. Retrying in 5s...")
+            _sleep(5, deadline)
+            r = _github_request("get_branch", "GET", repo_url, headers=headers, timeout=_request_timeout(deadline))
+            if r.status_code != 200:
+                log.info(f"Could not find main branch: {r.status_code} {r.text}")
+                return None
 
     # Step 2: Wait briefly so commits are fully registered
-    time.sleep(3)
+    _sleep(3, deadline)
 
     # Step 3: Configure Pages to use / (root) of main branch
-    pages_url = f"https://api.github.com/repos/{owner}/{repo_name}/pages"
     data = {
         "source": {
             "branch": "main",
@@ -127,12 +221,16 @@ def enable_github_pages(repo_name, token, owner):
         }
     }
 
-    response = requests.post(pages_url, json=data, headers=headers)
+    response = _github_request("enable_pages", "POST", pages_url, json=data, headers=headers,
+                               timeout=_request_timeout(deadline))
 
     if response.status_code in [201, 204]:
-        final_url = f"https://{owner}.github.io/{repo_name}/"
         log.info(f"GitHub Pages enabled: {final_url}")
         return final_url
+    elif response.status_code == 409:
+        # Enabled in the meantime (e.g. by another round)
+        log.info(f"GitHub Pages already enabled: {final_url}")
+        return final_url
     else:
         log.info(f"Failed to enable GitHub Pages: {response.status_code} {response.text}")
 
@@ -145,9 +243,9 @@ def enable_github_pages(repo_name, token, owner):
                     "path": "/"
                 }
             }
-            response2 = requests.post(pages_url, json=fallback_data, headers=headers)
+            response2 = _github_request("enable_pages", "POST", pages_url, json=fallback_data, headers=headers,
+                                        timeout=_request_timeout(deadline))
             if response2.status_code in [201, 204]:
-                final_url = f"https://{owner}.github.io/{repo_name}/"
                 log.info(f"GitHub Pages enabled via gh-pages: {final_url}")
                 return final_url
             else:
@@ -157,66 +255,134 @@ def enable_github_pages(repo_name, token, owner):
 
 
 
-def handle_round(task_id: str, round_number: int, generated_files: List[Dict[str, str]]):
+@span("provision")
+def provision_repo(task_id: str, deadline=None, ready_attempts: int = 5) -> Dict[str, Any]:
+    """
+    Create the task's repo and wait until its main branch is readable.
+    Independent of the generated files, so it can run while the LLM is working.
+    Returns the repo together with the warmed main ref and its head commit,
+    which the later commit reuses instead of looking them up again.
+    """
+    repo_name = repo_name_for(task_id)
+    client = _client(deadline)
+    repo = create_repo(repo_name, client=client)
+
+    for attempt in range(ready_attempts):
+        try:
+            ref = _github_call("get_git_ref", repo.get_git_ref, "heads/main")
+            base_commit = _github_call("get_git_commit", repo.get_git_commit, ref.object.sha)
+            log.info(f"Provisioned {repo_name}: main at {ref.object.sha}")
+            return {"repo": repo, "ref": ref, "base_commit": base_commit}
+        except GithubException as e:
+            if e.status not in (404, 409):
+                raise e
+            log.info(f"'main' not ready on {repo_name} (attempt {attempt + 1}), waiting...")
+            _sleep(1, deadline)
+    return {"repo": repo, "ref": None, "base_commit": None}
+
+
+def handle_round(task_id: str, round_number: int, generated_files: Iterable[Dict[str, Any]], deadline=None,
+                 provisioned: Dict[str, Any] | None = None):
     repo_name = f"task-{task_id}"
-
-    # Round 1: create repo (auto-init)
-    if round_number == 1:
-        repo = create_repo(repo_name)
+    client = _client(deadline)
+
+    # Round 1: create repo (auto-init), unless provision_repo already did it.
+    # A later round also creates the repo if round 1 never got to it
+    # (e.g. it was superseded before committing).
+    if provisioned is not None:
+        repo = provisioned["repo"]
+    elif round_number == 1:
+        repo = create_repo(repo_name, client=client)
     else:
-        repo = g.get_repo(f"{OWNER}/{repo_name}")
+        try:
+            repo = _github_call("get_repo", client.get_repo, f"{OWNER}/{repo_name}")
+        except GithubException as e:
+            if e.status != 404:
+                raise e
+            log.info(f"Repo {repo_name} missing in round {round_number}, creating it.")
+            repo = create_repo(repo_name, client=client)
+
+    # Commit all files in one commit per round (paths recorded as files stream through)
+    committed_paths = []
+
+    def _track(files):
+        for f in files:
+            committed_paths.append(f["path"])
+            yield f
 
-    # Commit all files in one commit per round
     commit_sha = commit_all_files_single_sha(
         repo,
-        files=[{"path": f["path"], "content": f["content"]} for f in generated_files],
-        commit_msg=f"Round {round_number} commit"
+        files=_track(generated_files),
+        commit_msg=f"Round {round_number} commit",
+        ref=provisioned and provisioned.get("ref"),
+        base_commit=provisioned and provisioned.get("base_commit"),
     )
 
     # Map all files to same SHA
-    sha_dict = {f["path"]: commit_sha for f in generated_files}
+    sha_dict = {path: commit_sha for path in committed_paths}
 
-    # Enable Pages only in round 1 (after all files committed)
-    pages_url = None
-    if round_number == 1:
-        pages_url = enable_github_pages(repo_name=repo_name, token=GITHUB_TOKEN, owner=OWNER)
+    # Enable Pages (after all files committed) unless an earlier round already did
+    pages_url = enable_github_pages(repo_name=repo_name, token=GITHUB_TOKEN, owner=OWNER, deadline=deadline,
+                                    main_ready=bool(provisioned and provisioned.get("ref")))
 
     return {"repo": repo_name, "commit_shas": sha_dict, "pages_url": pages_url}
 
 
 
 
-def commit_all_files_single_sha(repo, files: list, commit_msg: str):
+@span("github.commit_files")
+def commit_all_files_single_sha(repo, files: list, commit_msg: str, ref=None, base_commit=None):
     """
     Commit multiple files in a single commit and return the commit SHA.
+    `ref` / `base_commit` may be passed in when they were already fetched.
     """
     # 1 Get main branch reference
-    ref = repo.get_git_ref("heads/main")
-    base_commit = repo.get_git_commit(ref.object.sha)
+    if ref is None or base_commit is None:
+        ref = _github_call("get_git_ref", repo.get_git_ref, "heads/main")
+        base_commit = _github_call("get_git_commit", repo.get_git_commit, ref.object.sha)
 
-    # 2 Create blobs and InputGitTreeElement for each file
+    # 2 Create blobs and InputGitTreeElement for each file.
+    # `files` may be a lazy iterator from iter_workspace_files; each file is
+    # read/encoded only when its blob is created, so one file is held at a time.
     element_list = []
     for f in files:
-        blob = repo.create_git_blob(f["content"], "utf-8")
+        if "abs_path" in f:
+            text = None
+            if not f["binary"]:
+                try:
+                    text = read_file_text(f["abs_path"])
+                except UnicodeDecodeError:
+                    log.info(f"Non-UTF-8 bytes after sniffed prefix, sending as binary: {f['path']}")
+            if text is None:
+                # Large files are encoded in the CPU pool, which reads them from disk itself
+                content = offload(read_file_base64, f["abs_path"], size=f["size"])
+                blob = _github_call("create_git_blob", repo.create_git_blob, content, "base64")
+            else:
+                blob = _github_call("create_git_blob", repo.create_git_blob, text, "utf-8")
+        else:
+            blob = _github_call("create_git_blob", repo.create_git_blob, f["content"], f.get("encoding", "utf-8"))
         element_list.append(InputGitTreeElement(f["path"], "100644", "blob", sha=blob.sha))
 
     # 3 Create tree
-    tree = repo.create_git_tree(element_list, base_commit.tree)
+    tree = _github_call("create_git_tree", repo.create_git_tree, element_list, base_commit.tree)
 
     # 4 Create commit
-    commit = repo.create_git_commit(commit_msg, tree, [base_commit])
+    commit = _github_call("create_git_commit", repo.create_git_commit, commit_msg, tree, [base_commit])
 
     # 5 Update branch reference
-    ref.edit(commit.sha)
+    _github_call("update_ref", ref.edit, commit.sha)
 
     log.info(f"Committed all files in one commit: SHA {commit.sha}")
     return commit.sha
 
 
 
-def push_to_github(task_id: str, round_number: int, base_dir: str = "generated_app") -> Dict[str, Any]:
+def push_to_github(task_id: str, round_number: int, base_dir: str = "generated_app", deadline=None,
+                   provisioned: Dict[str, Any] | None = None) -> Dict[str, Any]:
     """
     Push all files from the generated app folder to GitHub in a single commit per round.
+    `deadline` (app.utils.deadline.Deadline) bounds every GitHub call and wait.
+    `provisioned` is the result of provision_repo when the repo was set up ahead of time.
     Returns:
         {
             "repo_name": str,
@@ -224,26 +390,16 @@ def push_to_github(task_id: str, round_number: int, base_dir: str = "generated_a
             "pages_url": Optional[str]
         }
     """
-    generated_files = []
-
-    # Step 1: Read all files from the generated directory
-    for root, dirs, files in os.walk(base_dir):
-        for f in files:
-            file_path = os.path.join(root, f)
-            rel_path = os.path.relpath(file_path, base_dir)
-            with open(file_path, "rb") as file_obj:
-                try:
-                    content = file_obj.read().decode("utf-8")
-                except UnicodeDecodeError:
-                    content = base64.b64encode(file_obj.read()).decode("utf-8")
-            generated_files.append({"path": rel_path, "content": content})
+    # Step 1: Lazily collect files from the generated directory.
+    # Text/binary is classified once; contents are read when each blob is created.
+    generated_files = iter_workspace_files(base_dir)
 
     # Step 2: Clean task_id
     task_id = task_id.replace(" ", "_").strip()
 
     # Step 3: Handle the round
     try:
-        result = handle_round(task_id, round_number, generated_files)
+        result = handle_round(task_id, round_number, generated_files, deadline=deadline, provisioned=provisioned)
 
         # Extract a single commit SHA (all files committed in one commit)
         commit_sha = None
@@ -1,6 +1,10 @@
-from huggingface_hub import InferenceClient
+import time
+from app.metrics import LLM_SECONDS, LLM_RESPONSE_BYTES
+from app.tracing import span
+from app.services.llm_ledger import record_call
 
-def ask_hugging_face(prompt: str, hf_token: str, model: str = "mistralai/Mistral-7B-Instruct-v0.3"):
+@span("llm.hugging_face")
+def ask_hugging_face(prompt: str, hf_token: str, model: str = "mistralai/Mistral-7B-Instruct-v0.3", timeout: float | None = None):
     """
     Sends a prompt to a Hugging Face model and returns the response.
 
@@ -8,6 +12,7 @@ def ask_hugging_face(prompt: str, hf_token: str, model: str = "mistralai/Mistral
         prompt: The input text to send to the model.
         hf_token: Your Hugging Face API token.
         model: The model to use for the inference.
+        timeout: Seconds to wait for the API before giving up (None waits forever).
 
     Returns:
         The text generated by the model.
@@ -18,10 +23,14 @@ def ask_hugging_face(prompt: str, hf_token: str, model: str = "mistralai/Mistral
     if not hf_token:
         raise RuntimeError("HF_API_TOKEN not found, please provide a valid token.")
 
-    # Initialize client with the model
-    client = InferenceClient(model=model, token=hf_token)
+    # Initialize client with the model (huggingface_hub is slow to import; only load it on fallback)
+    from huggingface_hub import InferenceClient
+    client = InferenceClient(model=model, token=hf_token, timeout=timeout)
 
     # Generate text
+    start = time.time()
+    outcome = "error"
+    usage = None
     try:
         response = client.chat_completion(
             messages=[
@@ -30,11 +39,20 @@ def ask_hugging_face(prompt: str, hf_token: str, model: str = "mistralai/Mistral
             # max_tokens=500  # Optional: Limit the length of the response
         )
         
+        usage = getattr(response, "usage", None)
         if response.choices and len(response.choices) > 0:
             generated_text = response.choices[0].message.content
+            outcome = "ok"
+            LLM_RESPONSE_BYTES.observe(len((generated_text or "").encode("utf-8")), provider="hugging_face")
             return generated_text
         else:
             raise RuntimeError("Received an empty response from the API.")
             
     except Exception as e:
-        raise RuntimeError(f"Hugging Face API Error: {e}")
\ No newline at end of file
+        raise RuntimeError(f"Hugging Face API Error: {e}")
+    finally:
+        latency = time.time() - start
+        LLM_SECONDS.observe(latency, provider="hugging_face", outcome=outcome)
+        record_call("hugging_face", model, outcome, latency,
+                    input_tokens=getattr(usage, "prompt_tokens", None),
+                    output_tokens=getattr(usage, "completion_tokens", None))
\ No newline at end of file
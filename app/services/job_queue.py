@@ -0,0 +1,144 @@
+import os
+import time
+import heapq
+import itertools
+import threading
+from app.services.task_coordinator import coordinator
+from app.metrics import QUEUE_DEPTH, JOBS_IN_FLIGHT
+from app.logger import get_logger
+
+log = get_logger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))
+if JOB_WORKERS < 1:
+    # Without a worker no job would ever run (and the provisioning pool can't be sized)
+    raise ValueError(f"JOB_WORKERS must be at least 1, got {JOB_WORKERS}")
+
+# How long to wait before retrying a task that another process is working on
+REMOTE_BUSY_RETRY_SECONDS = float(os.getenv("REMOTE_BUSY_RETRY_SECONDS", 0.5))
+
+
+class JobQueue:
+    """
+    Earliest-deadline-first job queue served by a fixed pool of worker threads.
+    Jobs are ordered by their absolute deadline, so a job that is about to run
+    out of time is picked before one that was received later.
+
+    Jobs submitted with a `task` key are serialized per task through the
+    TaskCoordinator: while one round of a task runs, later rounds of the same
+    task are parked and released as soon as the running round frees the task,
+    while jobs for other tasks keep flowing.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS):
+        self._workers = workers
+        self._heap = []
+        self._parked = {}   # task -> entries waiting for this process to free the task
+        self._retry = []    # (retry_at, entry) for tasks held by another process
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._threads = []
+        self._in_flight = 0
+        self._stopping = False
+        coordinator.add_release_listener(self._task_released)
+
+    def start(self):
+        with self._cond:
+            if self._threads:
+                return
+            self._stopping = False
+            for i in range(self._workers):
+                t = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+        log.info(f"Job queue started with {self._workers} workers.")
+
+    def stop(self, timeout: float = 5.0):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+        log.info("Job queue stopped.")
+
+    def submit(self, deadline, fn, *args, task: str | None = None, **kwargs):
+        """
+        Queue `fn(*args, **kwargs)`; `deadline` (a Deadline) sets its priority.
+        Jobs sharing a `task` never run concurrently.
+        """
+        with self._cond:
+            heapq.heappush(self._heap, (deadline.expires_at, next(self._seq), task, fn, args, kwargs))
+            self._cond.notify()
+
+    def depth(self) -> int:
+        with self._cond:
+            return len(self._heap) + len(self._retry) + sum(len(v) for v in self._parked.values())
+
+    def in_flight(self) -> int:
+        with self._cond:
+            return self._in_flight
+
+    def _task_released(self, task: str):
+        with self._cond:
+            for entry in self._parked.pop(task, []):
+                heapq.heappush(self._heap, entry)
+            self._cond.notify_all()
+
+    def _pop_runnable(self):
+        """
+        Pop the earliest-deadline job whose task is free, as (entry, token);
+        the token releases the task. Caller holds the condition.
+        """
+        now = time.time()
+        while self._retry and self._retry[0][0] <= now:
+            heapq.heappush(self._heap, heapq.heappop(self._retry)[1])
+
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            task = entry[2]
+            if task is None:
+                return entry, None
+            state, token = coordinator.try_acquire(task)
+            if state == "acquired":
+                return entry, token
+            if state == "busy_local":
+                self._parked.setdefault(task, []).append(entry)
+            else:
+                heapq.heappush(self._retry, (now + REMOTE_BUSY_RETRY_SECONDS, entry))
+        return None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopping:
+                        return
+                    runnable = self._pop_runnable()
+                    if runnable is not None:
+                        break
+                    wait = self._retry[0][0] - time.time() if self._retry else None
+                    self._cond.wait(timeout=wait)
+                self._in_flight += 1
+            entry, token = runnable
+            _, _, task, fn, args, kwargs = entry
+            try:
+                if task is None:
+                    fn(*args, **kwargs)
+                else:
+                    # The job may release its task early (coordinator.release_own); the token
+                    # makes the release below a no-op then, even if the next round holds the task
+                    with coordinator.leased(task, token):
+                        fn(*args, **kwargs)
+            except Exception as e:
+                log.error(f"Job {getattr(fn, '__name__', fn)} failed: {e}", exc_info=True)
+            finally:
+                with self._cond:
+                    self._in_flight -= 1
+                if task is not None:
+                    coordinator.release(task, token)
+
+
+job_queue = JobQueue()
+QUEUE_DEPTH.set_function(job_queue.depth)
+JOBS_IN_FLIGHT.set_function(job_queue.in_flight)
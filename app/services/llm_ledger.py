@@ -0,0 +1,46 @@
+import os
+import json
+from app.database import record_llm_call
+from app.logger import get_logger, get_log_context
+
+log = get_logger(__name__)
+
+# USD per million tokens: (input, cached input, output). Models missing here get no cost.
+# LLM_PRICES_JSON='{"model": [input, cached, output]}' adds or overrides entries.
+LLM_PRICES = {
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+}
+LLM_PRICES.update({model: tuple(prices) for model, prices in json.loads(os.getenv("LLM_PRICES_JSON", "{}")).items()})
+
+
+def call_cost(model: str | None, input_tokens: int | None, cached_input_tokens: int | None,
+              output_tokens: int | None) -> float | None:
+    prices = LLM_PRICES.get(model)
+    if prices is None or input_tokens is None:
+        return None
+    cached = cached_input_tokens or 0
+    input_price, cached_price, output_price = prices
+    return ((input_tokens - cached) * input_price + cached * cached_price
+            + (output_tokens or 0) * output_price) / 1_000_000
+
+
+def record_call(provider: str, model: str | None, outcome: str, latency_seconds: float,
+                input_tokens: int | None = None, cached_input_tokens: int | None = None,
+                output_tokens: int | None = None):
+    """
+    Store one provider call in the ledger, attributed to the job/task/round of
+    the current log context. Ledger failures are logged, never raised.
+    """
+    context = get_log_context()
+    try:
+        record_llm_call(
+            provider, outcome, job_id=context.get("job_id"), task=context.get("task"),
+            round_number=context.get("round"), model=model, input_tokens=input_tokens,
+            cached_input_tokens=cached_input_tokens, output_tokens=output_tokens,
+            latency_seconds=round(latency_seconds, 3),
+            cost_usd=call_cost(model, input_tokens, cached_input_tokens, output_tokens),
+        )
+    except Exception as e:
+        log.warning(f"Could not record {provider} call in the ledger: {e}")
@@ -4,6 +4,8 @@ import base64
 import re
 import xml.etree.ElementTree as ET
 from app.logger import get_logger
+from app.services.prompt_templates import static_prefix, render_suffix
+from app.cpu import offload
 log = get_logger(__name__)
 
 
@@ -81,86 +83,15 @@ def build_prompt(task_description,attachments,checks, round_number, previous_con
 
 # building XML prompt for better structure and multi-file handling
 
-def build_prompt_xml(task_description, attachments, checks, round_number, previous_context=None):
+def build_prompt_xml(task_description, attachments, checks, round_number, previous_context=None, version=None):
     """
     Builds a structured XML prompt for LLM-based code generation (robust version).
     Designed to ensure valid XML output for multi-file applications.
+    The fixed instructions come first and never change between jobs, so the
+    provider's prompt cache can reuse them; the job's data follows.
     """
-
-    prompt = f"""
-    <instruction>
-      <role>
-        You are an expert software engineer and full-stack developer with production experience in HTML, CSS, JS, Python, and modern frameworks.
-      </role>
-
-      <objective>
-        Your job is to generate or update a complete deployable application based on the user's input and round information below.
-      </objective>
-
-      <round_info>
-        <current_round>{round_number}</current_round>
-        <rules>
-          <rule>If round = 1, build the entire project from scratch.</rule>
-          <rule>If round &gt; 1, update or modify the existing project according to the new instructions while keeping previous functionalities intact.</rule>
-          <rule>Ensure that the project runs correctly on GitHub Pages or via the provided run command.</rule>
-        </rules>
-      </round_info>
-
-      <task_description><![CDATA[
-      {task_description}
-      ]]></task_description>
-
-      <attachments><![CDATA[
-      {attachments}
-      ]]></attachments>
-
-      <evaluation_criteria><![CDATA[
-      {checks}
-      ]]></evaluation_criteria>
-
-      <context><![CDATA[
-      {previous_context or "No previous code. This is the first round."}
-      ]]></context>
-
-      <output_format>
-        Respond strictly in the following XML structure:
-        <response>
-          <file>
-            <path>relative/path/to/file</path>
-            <language>html|css|javascript|python|etc</language>
-            <content><![CDATA[
-                full file content here (complete code, no truncation)
-            ]]></content>
-          </file>
-          ...
-          <run_command>command to run app, if any (e.g. python app.py, npm start, etc.)</run_command>
-        </response>
-      </output_format>
-
-      <rules>
-        <rule>Each file must be complete and ready to run.</rule>
-        <rule>Do not omit imports or boilerplate.</rule>
-        <rule>Maintain consistent indentation and syntax.</rule>
-        <rule>Use clean, modular, and efficient code.</rule>
-        <rule>When modifying existing code, only update necessary parts.</rule>
-        <rule>Generate README.md — must look professional and concise.</rule>
-        <rule>Do not include any explanations, markdown, comments, or text outside &lt;response&gt; tags.</rule>
-        <rule>Do not use ellipses ("...") or placeholder code.</rule>
-      </rules>
-
-      <deployment_rules>
-        <rule>All generated files must be in the project root unless specified.</rule>
-        <rule>The entry point must be index.html (for GitHub Pages).</rule>
-        <rule>Use relative paths for assets (./style.css, ./script.js, etc.).</rule>
-        <rule>If backend, ensure the run command works (e.g. FastAPI, Flask).</rule>
-        <rule>Each file must be syntactically complete and production-ready.</rule>
-      </deployment_rules>
-
-      <generate>Generate your output now inside the &lt;response&gt; block only.</generate>
-    </instruction>
-    """
-
-    return prompt.strip()
+    return static_prefix(version) + render_suffix(task_description, attachments, checks, round_number,
+                                                  previous_context, version=version)
 
 
 
@@ -212,11 +143,25 @@ def save_llm_output(response_json, base_dir=os.path.join(os.getcwd(), "generated
 
 
 
-def save_llm_output_xml(response_xml, base_dir=os.path.join(os.getcwd(), "generated_app")):
-    if not response_xml:
-        log.info("Empty response_xml received — skipping save.")
-        return
+def parse_llm_output_xml(response_xml):
+    """
+    Parse an LLM XML response into a list of files:
+        [{"path": str, "language": str, "content": str}, ...]
+    plus the run command (or None). Returns None if the XML is invalid.
+    Large responses are parsed in the CPU pool (see app/cpu); the response is
+    pickled to the worker and the parsed files back, so it is copied twice.
+    """
+    parsed, error = offload(_parse_llm_output_xml, response_xml, size=len(response_xml))
+    if error:
+        details, snippet = error
+        log.info("Invalid XML received.")
+        log.info(f"Error details: {details}")
+        log.info(f"\n--- XML Snippet Preview ---\n{snippet}\n----")
+    return parsed
+
 
+def _parse_llm_output_xml(response_xml):
+    """parse_llm_output_xml without logging, so it can run in a worker process; returns (parsed, error)."""
     # --- Clean LLM-style formatting (remove ```xml or ``` fences) ---
     cleaned_xml = re.sub(r"```(?:xml)?", "", response_xml).strip("` \n")
 
@@ -228,46 +173,68 @@ def save_llm_output_xml(response_xml, base_dir=os.path.join(os.getcwd(), "genera
     try:
         root = ET.fromstring(cleaned_xml)
     except ET.ParseError as e:
-        log.info("Invalid XML received.")
-        log.info(f"Error details: {e}")
-        snippet = cleaned_xml[:500]
-        log.info(f"\n--- XML Snippet Preview ---\n{snippet}\n----")
-        return
-
-    # --- Create output base directory ---
-    os.makedirs(base_dir, exist_ok=True)
+        return None, (str(e), cleaned_xml[:500])
 
     # --- Iterate through all <response> tags (or root if only one) ---
     responses = root.findall("response") if root.tag == "root" else [root]
 
+    files = []
+    run_command = None
     for resp in responses:
         for file_elem in resp.findall("file"):
-            try:
-                path = file_elem.findtext("path")
-                content = file_elem.findtext("content") or ""
-                language = (file_elem.findtext("language") or "").lower()
+            path = file_elem.findtext("path")
+            if not path:
+                continue
+            files.append({
+                "path": path.strip(),
+                "language": (file_elem.findtext("language") or "").lower(),
+                "content": file_elem.findtext("content") or "",
+            })
 
-                if not path:
-                    continue
+        run_cmd_elem = resp.find("run_command")
+        if run_cmd_elem is not None and run_cmd_elem.text:
+            run_command = run_cmd_elem.text.strip()
 
-                file_path = os.path.join(base_dir, path)
-                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    return {"files": files, "run_command": run_command}, None
 
-                # --- Save file content ---
-                if language == "binary":
-                    with open(file_path, "wb") as f:
-                        f.write(base64.b64decode(content))
-                else:
-                    with open(file_path, "w", encoding="utf-8") as f:
-                        f.write(content.strip())
 
-                log.info(f"✅ Saved: {path}")
+def save_llm_output_xml(response_xml, base_dir=os.path.join(os.getcwd(), "generated_app"), parsed=None):
+    """
+    Write the files of an XML response under `base_dir`; returns the parsed response, or None if unusable.
+    `parsed` is the response already run through parse_llm_output_xml, to avoid parsing it twice.
+    """
+    if not response_xml:
+        log.info("Empty response_xml received — skipping save.")
+        return
 
-            except Exception as e:
-                log.info(f"⚠️ Error saving {path}: {e}")
+    parsed = parsed or parse_llm_output_xml(response_xml)
+    if parsed is None:
+        return
 
-        run_cmd_elem = resp.find("run_command")
-        if run_cmd_elem is not None and run_cmd_elem.text:
-            log.info(f"Run Command: {run_cmd_elem.text.strip()}")
+    # --- Create output base directory ---
+    os.makedirs(base_dir, exist_ok=True)
+
+    for file in parsed["files"]:
+        path = file["path"]
+        try:
+            file_path = os.path.join(base_dir, path)
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+            # --- Save file content ---
+            if file["language"] == "binary":
+                with open(file_path, "wb") as f:
+                    f.write(base64.b64decode(file["content"]))
+            else:
+                with open(file_path, "w", encoding="utf-8") as f:
+                    f.write(file["content"].strip())
+
+            log.info(f"✅ Saved: {path}")
+
+        except Exception as e:
+            log.info(f"⚠️ Error saving {path}: {e}")
+
+    if parsed["run_command"]:
+        log.info(f"Run Command: {parsed['run_command']}")
 
-    log.info(f"🎯 Files saved successfully in: {base_dir}")
\ No newline at end of file
+    log.info(f"🎯 Files saved successfully in: {base_dir}")
+    return parsed
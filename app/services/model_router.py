@@ -0,0 +1,58 @@
+import os
+from app.logger import get_logger
+
+log = get_logger(__name__)
+
+# Set MODEL_ROUTING=0 to send every job to ROUTING_LARGE_MODEL
+MODEL_ROUTING = os.getenv("MODEL_ROUTING", "1").lower() in ("1", "true", "yes")
+ROUTING_SMALL_MODEL = os.getenv("ROUTING_SMALL_MODEL", "gpt-4.1-mini")
+ROUTING_LARGE_MODEL = os.getenv("ROUTING_LARGE_MODEL", "gpt-4.1")
+
+# A job is a small edit when every feature is at or below its limit
+ROUTING_SMALL_LIMITS = {
+    "brief_chars": int(os.getenv("ROUTING_SMALL_MAX_BRIEF_CHARS", 600)),
+    "checks": int(os.getenv("ROUTING_SMALL_MAX_CHECKS", 5)),
+    "attachment_bytes": int(os.getenv("ROUTING_SMALL_MAX_ATTACHMENT_BYTES", 100_000)),
+    "context_chars": int(os.getenv("ROUTING_SMALL_MAX_CONTEXT_CHARS", 60_000)),
+}
+# Round 1 builds the whole project, so it goes to the large model unless this is set
+ROUTING_SMALL_FIRST_ROUND = os.getenv("ROUTING_SMALL_FIRST_ROUND", "0").lower() in ("1", "true", "yes")
+
+
+def _attachment_bytes(attachments) -> int:
+    total = 0
+    for attachment in attachments or []:
+        total += len(str(attachment.get("url", ""))) if isinstance(attachment, dict) else len(str(attachment))
+    return total
+
+
+def job_features(brief: str, checks, attachments, round_number: int, previous_context: str | None = None) -> dict:
+    return {
+        "round": round_number,
+        "brief_chars": len(brief or ""),
+        "checks": len(checks or []),
+        "attachment_bytes": _attachment_bytes(attachments),
+        "context_chars": len(previous_context or ""),
+    }
+
+
+def route_job(brief: str, checks, attachments, round_number: int, previous_context: str | None = None) -> dict:
+    """
+    Choose the models to try for a job, in order. Small edits start on the
+    small model and escalate to the large one if its answer is unusable.
+    The returned decision is stored with the job; callers append to "attempts".
+    """
+    features = job_features(brief, checks, attachments, round_number, previous_context)
+    reasons = [f"{name} {features[name]} > {limit}" for name, limit in ROUTING_SMALL_LIMITS.items()
+               if features[name] > limit]
+    if round_number == 1 and not ROUTING_SMALL_FIRST_ROUND:
+        reasons.insert(0, "first round")
+    if not MODEL_ROUTING:
+        reasons = ["routing disabled"]
+
+    if reasons:
+        tier, models = "large", [ROUTING_LARGE_MODEL]
+    else:
+        tier, models = "small", list(dict.fromkeys([ROUTING_SMALL_MODEL, ROUTING_LARGE_MODEL]))
+    log.info(f"Routing to {tier} model {models[0]}" + (f" ({', '.join(reasons)})" if reasons else ""))
+    return {"tier": tier, "models": models, "reasons": reasons, "features": features, "attempts": []}
@@ -0,0 +1,119 @@
+import os
+import hashlib
+import textwrap
+
+# Prompts are a static prefix (identical bytes for every job) followed by a per-job
+# suffix, so providers can serve the prefix from their prompt cache.
+# Any edit to a prefix must go into a new version: benchmarks/prompt_prefix.py pins their hashes.
+
+_PREFIX_V1 = """
+<instruction>
+  <role>
+    You are an expert software engineer and full-stack developer with production experience in HTML, CSS, JS, Python, and modern frameworks.
+  </role>
+
+  <objective>
+    Your job is to generate or update a complete deployable application based on the user's input and the round information given in the &lt;job&gt; block at the end of this prompt.
+  </objective>
+
+  <round_rules>
+    <rule>If round = 1, build the entire project from scratch.</rule>
+    <rule>If round &gt; 1, update or modify the existing project according to the new instructions while keeping previous functionalities intact.</rule>
+    <rule>Ensure that the project runs correctly on GitHub Pages or via the provided run command.</rule>
+  </round_rules>
+
+  <output_format>
+    Respond strictly in the following XML structure:
+    <response>
+      <file>
+        <path>relative/path/to/file</path>
+        <language>html|css|javascript|python|etc</language>
+        <content><![CDATA[
+            full file content here (complete code, no truncation)
+        ]]></content>
+      </file>
+      ...
+      <run_command>command to run app, if any (e.g. python app.py, npm start, etc.)</run_command>
+    </response>
+  </output_format>
+
+  <rules>
+    <rule>Each file must be complete and ready to run.</rule>
+    <rule>Do not omit imports or boilerplate.</rule>
+    <rule>Maintain consistent indentation and syntax.</rule>
+    <rule>Use clean, modular, and efficient code.</rule>
+    <rule>When modifying existing code, only update necessary parts.</rule>
+    <rule>Generate README.md — must look professional and concise.</rule>
+    <rule>Do not include any explanations, markdown, comments, or text outside &lt;response&gt; tags.</rule>
+    <rule>Do not use ellipses ("...") or placeholder code.</rule>
+  </rules>
+
+  <deployment_rules>
+    <rule>All generated files must be in the project root unless specified.</rule>
+    <rule>The entry point must be index.html (for GitHub Pages).</rule>
+    <rule>Use relative paths for assets (./style.css, ./script.js, etc.).</rule>
+    <rule>If backend, ensure the run command works (e.g. FastAPI, Flask).</rule>
+    <rule>Each file must be syntactically complete and production-ready.</rule>
+  </deployment_rules>
+</instruction>
+"""
+
+_SUFFIX_V1 = """
+<job>
+  <current_round>{round_number}</current_round>
+
+  <task_description><![CDATA[
+  {task_description}
+  ]]></task_description>
+
+  <attachments><![CDATA[
+  {attachments}
+  ]]></attachments>
+
+  <evaluation_criteria><![CDATA[
+  {checks}
+  ]]></evaluation_criteria>
+
+  <context><![CDATA[
+  {previous_context}
+  ]]></context>
+</job>
+
+<generate>Generate your output now inside the &lt;response&gt; block only.</generate>
+"""
+
+# version -> (static prefix, str.format template of the dynamic suffix); rendered once at import
+PROMPT_TEMPLATES = {
+    "v1": (textwrap.dedent(_PREFIX_V1).strip() + "\n\n", textwrap.dedent(_SUFFIX_V1).strip()),
+}
+
+PROMPT_TEMPLATE_VERSION = os.getenv("PROMPT_TEMPLATE_VERSION", "v1")
+
+
+def _template(version: str | None):
+    version = version or PROMPT_TEMPLATE_VERSION
+    try:
+        return PROMPT_TEMPLATES[version]
+    except KeyError:
+        raise ValueError(f"Unknown prompt template version {version!r} (known: {', '.join(PROMPT_TEMPLATES)})")
+
+
+def static_prefix(version: str | None = None) -> str:
+    """The cacheable part of the prompt; the same bytes for every job of a template version."""
+    return _template(version)[0]
+
+
+def prefix_sha256(version: str | None = None) -> str:
+    return hashlib.sha256(static_prefix(version).encode("utf-8")).hexdigest()
+
+
+def render_suffix(task_description, attachments, checks, round_number, previous_context=None,
+                  version: str | None = None) -> str:
+    """The per-job part of the prompt, placed after the static prefix."""
+    return _template(version)[1].format(
+        round_number=round_number,
+        task_description=task_description,
+        attachments=attachments,
+        checks=checks,
+        previous_context=previous_context or "No previous code. This is the first round.",
+    )
@@ -0,0 +1,115 @@
+import os
+import re
+import fcntl
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+from app.database import register_task_round, load_latest_round
+from app.logger import get_logger
+
+log = get_logger(__name__)
+
+LOCK_DIR = os.path.join(os.getcwd(), "app", "data", "locks")
+
+# (task, token) held by the job running in this context; see TaskCoordinator.leased
+_lease = contextvars.ContextVar("task_lease", default=None)
+
+
+def _lock_path(task: str) -> str:
+    safe = re.sub(r"[^A-Za-z0-9._-]", "_", task)
+    return os.path.join(LOCK_DIR, f"{safe}.lock")
+
+
+class TaskCoordinator:
+    """
+    Serializes rounds of the same task while different tasks run in parallel.
+
+    - Within a process, a task is "busy" while one of its rounds holds it.
+    - Across uvicorn workers, the same task is guarded by an exclusive
+      flock on app/data/locks/<task>.lock (released automatically if the
+      process dies).
+    - The newest round seen for each task is stored in SQLite, so any worker
+      can tell when the round it is running has been superseded.
+    - Every acquisition gets its own token, and only the matching token
+      releases it, so a late release from a previous owner is a no-op.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._held = {}  # task -> (open lock file, token)
+        self._tokens = itertools.count(1)
+        self._listeners = []
+
+    def add_release_listener(self, callback):
+        """`callback(task)` is called whenever a task becomes free in this process."""
+        self._listeners.append(callback)
+
+    def register(self, task: str, round_number: int, job_id: str):
+        """Record a newly received round; older rounds of the task become obsolete."""
+        register_task_round(task, round_number, job_id)
+
+    def is_superseded(self, task: str, round_number: int) -> bool:
+        latest = load_latest_round(task)
+        return latest is not None and latest > round_number
+
+    def is_busy(self, task: str) -> bool:
+        with self._lock:
+            return task in self._held
+
+    def try_acquire(self, task: str) -> tuple[str, int | None]:
+        """
+        Try to take ownership of `task`.
+        Returns (state, token): state is "acquired", "busy_local" (another
+        thread here holds it) or "busy_remote" (another process holds it);
+        the token, set only when acquired, is needed to release the task.
+        """
+        with self._lock:
+            if task in self._held:
+                return "busy_local", None
+            os.makedirs(LOCK_DIR, exist_ok=True)
+            lock_file = open(_lock_path(task), "a+")
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                return "busy_remote", None
+            token = next(self._tokens)
+            self._held[task] = (lock_file, token)
+            return "acquired", token
+
+    @contextmanager
+    def leased(self, task: str, token: int):
+        """Run the block as the owner of `task`, so release_own() inside it can free the task early."""
+        reset = _lease.set((task, token))
+        try:
+            yield
+        finally:
+            _lease.reset(reset)
+
+    def release_own(self, task: str):
+        """Release `task` if the calling job holds it; a no-op otherwise."""
+        lease = _lease.get()
+        if lease is not None and lease[0] == task:
+            self.release(task, lease[1])
+
+    def release(self, task: str, token: int):
+        """
+        Give up ownership of `task` taken with `token`. Safe to call more than
+        once: once the task is released (or re-acquired by someone else) it does nothing.
+        """
+        with self._lock:
+            held = self._held.get(task)
+            if held is None or held[1] != token:
+                return
+            lock_file = self._held.pop(task)[0]
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+        finally:
+            lock_file.close()
+        log.info(f"Released task {task}")
+        for callback in self._listeners:
+            callback(task)
+
+
+coordinator = TaskCoordinator()
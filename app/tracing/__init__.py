@@ -0,0 +1,2 @@
+from .spans import Trace, start_trace, span
+from .profiling import maybe_profile, profile_path_for
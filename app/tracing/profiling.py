@@ -0,0 +1,74 @@
+import os
+import cProfile
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from app.logger import get_logger
+
+log = get_logger(__name__)
+
+# PROFILE_JOBS=1 profiles every job; otherwise only requests with "profile": true
+PROFILE_JOBS = os.getenv("PROFILE_JOBS", "0").lower() in ("1", "true", "yes")
+# Profiles are written next to the job database
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.getcwd(), "app", "data", "profiles"))
+PROFILE_TOP_ALLOCATIONS = int(os.getenv("PROFILE_TOP_ALLOCATIONS", 30))
+
+# tracemalloc is process-wide: it stays on while any profiled job is running
+_tracemalloc_users = 0
+_tracemalloc_lock = threading.Lock()
+
+
+def _start_tracemalloc():
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _tracemalloc_users += 1
+
+
+def _stop_tracemalloc():
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0 and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+def profile_path_for(job_id: str) -> str:
+    """Path of the cProfile dump for `job_id` (allocations go to the same name with .alloc.txt)."""
+    return os.path.join(PROFILE_DIR, f"{job_id}.prof")
+
+
+@contextmanager
+def maybe_profile(job_id: str, enabled: bool = False):
+    """
+    Run the block under cProfile and tracemalloc when `enabled` or PROFILE_JOBS is set.
+    Yields the .prof path (None when not profiling). cProfile only sees the
+    calling thread; tracemalloc sees allocations of every thread while it runs.
+    """
+    if not (enabled or PROFILE_JOBS):
+        yield None
+        return
+
+    path = profile_path_for(job_id)
+    profiler = cProfile.Profile()
+    _start_tracemalloc()
+    profiler.enable()
+    try:
+        yield path
+    finally:
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+        peak = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else 0
+        _stop_tracemalloc()
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            profiler.dump_stats(path)
+            if snapshot is not None:
+                with open(path[:-len(".prof")] + ".alloc.txt", "w", encoding="utf-8") as f:
+                    f.write(f"peak traced memory: {peak} bytes\n")
+                    for stat in snapshot.statistics("lineno")[:PROFILE_TOP_ALLOCATIONS]:
+                        f.write(f"{stat}\n")
+            log.info(f"Profile for job {job_id} written to {path}")
+        except Exception as e:
+            log.warning(f"Could not write profile for job {job_id}: {e}")
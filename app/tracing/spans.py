@@ -0,0 +1,90 @@
+import os
+import time
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Spans kept per job; anything beyond is counted but not stored
+TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", 500))
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Trace:
+    """Spans recorded for one job; shared by every thread running inside its context."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.spans = []
+        self.dropped = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _next_id(self) -> int:
+        with self._lock:
+            return next(self._ids)
+
+    def _add(self, span: dict):
+        with self._lock:
+            if len(self.spans) < TRACE_MAX_SPANS:
+                self.spans.append(span)
+            else:
+                self.dropped += 1
+
+    def to_dict(self) -> dict:
+        """JSON-ready form: spans ordered by start time, offsets in seconds from the trace start."""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s["start"])
+            return {"started_at": self.started_at, "spans": spans, "dropped": self.dropped}
+
+
+@contextmanager
+def start_trace():
+    """Record spans opened inside the block (and in contexts copied from it) into a new Trace."""
+    trace = Trace()
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(None)
+    try:
+        yield trace
+    finally:
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """
+    Time the block as a child of the enclosing span.
+    Outside a trace this does nothing, so library code can be wrapped unconditionally.
+    Attributes may be added while the span is open through the yielded dict.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield attrs
+        return
+
+    span_id = trace._next_id()
+    token = _current_span.set(span_id)
+    start = time.time()
+    error = None
+    try:
+        yield attrs
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"[:200]
+        raise
+    finally:
+        _current_span.reset(token)
+        record = {
+            "id": span_id,
+            "parent": _current_span.get(),
+            "name": name,
+            "start": round(start - trace.started_at, 4),
+            "duration": round(time.time() - start, 4),
+        }
+        if attrs:
+            record["attrs"] = attrs
+        if error:
+            record["error"] = error
+        trace._add(record)
@@ -1,3 +1,9 @@
 from .check_secret import check_secret
-from .utilities import clear_generated_app_folder_except_git, clear_generated_app_folder_by_round
-from .llm_context import save_context,load_context
\ No newline at end of file
+from .utilities import clear_generated_app_folder_except_git, clear_generated_app_folder_by_round, workspace_for
+from .llm_context import save_context,load_context
+from .file_collector import iter_workspace_files, read_file_base64, read_file_text
+from .request_recorder import record_request, REQUEST_LOG_PATH
+from .workspace import stage_workspace, commit_workspace, discard_staging, sweep_orphans, sweep_idle_workspaces, \
+    sweep_workspaces
+from .attachments import (spill_attachments, load_attachments, discard_attachments, sweep_attachments, PayloadTooLarge,
+                          MAX_REQUEST_BYTES, MAX_ATTACHMENT_BYTES)
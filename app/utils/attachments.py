@@ -0,0 +1,84 @@
+import os
+import json
+import time
+import shutil
+from app.logger import get_logger
+
+log = get_logger(__name__)
+
+# Size caps for /api/generate-app, answered with 413 when exceeded
+MAX_REQUEST_BYTES = int(os.getenv("MAX_REQUEST_BYTES", 25 * 1024 * 1024))
+MAX_ATTACHMENT_BYTES = int(os.getenv("MAX_ATTACHMENT_BYTES", 10 * 1024 * 1024))
+
+# Attachments are written here while the request is parsed; jobs only carry references
+ATTACHMENTS_DIR = os.getenv("ATTACHMENTS_DIR", os.path.join(os.getcwd(), "app", "data", "attachments"))
+# Folders of jobs that never finished (crash, restart) are removed after this long
+ATTACHMENT_MAX_AGE_SECONDS = float(os.getenv("ATTACHMENT_MAX_AGE_SECONDS", 86400))
+
+
+class PayloadTooLarge(ValueError):
+    """A request body or one of its attachments is over its size cap."""
+
+
+def _job_dir(job_id: str) -> str:
+    return os.path.join(ATTACHMENTS_DIR, job_id)
+
+
+def spill_attachments(job_id: str, attachments) -> list:
+    """
+    Write each attachment to its own file and return references
+    {"name", "path", "bytes"} in its place. Every size is checked before
+    anything is written.
+    """
+    encoded = [json.dumps(attachment, ensure_ascii=False).encode("utf-8") for attachment in attachments or []]
+    for index, data in enumerate(encoded):
+        if len(data) > MAX_ATTACHMENT_BYTES:
+            name = attachments[index].get("name") if isinstance(attachments[index], dict) else None
+            raise PayloadTooLarge(f"Attachment {name or index} is {len(data)} bytes; "
+                                  f"the limit is {MAX_ATTACHMENT_BYTES} bytes")
+    if not encoded:
+        return []
+
+    folder = _job_dir(job_id)
+    os.makedirs(folder, exist_ok=True)
+    refs = []
+    for index, data in enumerate(encoded):
+        path = os.path.join(folder, f"{index}.json")
+        with open(path, "wb") as f:
+            f.write(data)
+        attachment = attachments[index]
+        refs.append({"name": attachment.get("name") if isinstance(attachment, dict) else None,
+                     "path": path, "bytes": len(data)})
+    return refs
+
+
+def load_attachments(refs) -> list:
+    """The attachments behind references made by spill_attachments, as they were received."""
+    root = os.path.realpath(ATTACHMENTS_DIR)
+    attachments = []
+    for ref in refs or []:
+        path = os.path.realpath(ref["path"])
+        if os.path.commonpath([root, path]) != root:
+            raise ValueError(f"Attachment reference outside {ATTACHMENTS_DIR}: {ref['path']}")
+        with open(path, encoding="utf-8") as f:
+            attachments.append(json.load(f))
+    return attachments
+
+
+def discard_attachments(job_id: str) -> None:
+    shutil.rmtree(_job_dir(job_id), ignore_errors=True)
+
+
+def sweep_attachments(max_age: float = ATTACHMENT_MAX_AGE_SECONDS) -> int:
+    """Remove attachment folders older than `max_age` seconds; returns how many."""
+    if not os.path.isdir(ATTACHMENTS_DIR):
+        return 0
+    cutoff = time.time() - max_age
+    count = 0
+    for entry in os.scandir(ATTACHMENTS_DIR):
+        if entry.is_dir(follow_symlinks=False) and entry.stat(follow_symlinks=False).st_mtime < cutoff:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            count += 1
+    if count:
+        log.info(f"Removed {count} stale attachment folders.")
+    return count
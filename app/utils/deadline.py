@@ -0,0 +1,51 @@
+import os
+import time
+
+# Total budget for a job, counted from the moment the request is received
+JOB_DEADLINE_SECONDS = int(os.getenv("JOB_DEADLINE_SECONDS", os.getenv("EVALUATION_DEADLINE_SECONDS", 600)))
+
+# Time kept aside at the end of every job for submitting the result
+SUBMIT_RESERVE_SECONDS = float(os.getenv("SUBMIT_RESERVE_SECONDS", 30))
+
+
+class Deadline:
+    """
+    Absolute point in time by which a job must have submitted its result.
+    Stages ask it for timeouts so they shrink as the budget is used up.
+    """
+
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at
+
+    @classmethod
+    def from_start(cls, started_at: float | None = None, budget: float = JOB_DEADLINE_SECONDS):
+        return cls((started_at or time.time()) + budget)
+
+    def remaining(self, reserve: float = SUBMIT_RESERVE_SECONDS) -> float:
+        """Seconds left for work, after keeping `reserve` seconds for submission."""
+        return self.expires_at - reserve - time.time()
+
+    def expired(self, reserve: float = SUBMIT_RESERVE_SECONDS) -> bool:
+        return self.remaining(reserve) <= 0
+
+    def can_afford(self, seconds: float, reserve: float = SUBMIT_RESERVE_SECONDS) -> bool:
+        """True if a stage expected to take `seconds` can still finish in time."""
+        return self.remaining(reserve) >= seconds
+
+    def timeout(self, cap: float | None = None, minimum: float = 1.0,
+                reserve: float = SUBMIT_RESERVE_SECONDS) -> float:
+        """
+        Timeout for the next blocking call: what is left of the budget,
+        optionally capped, but never below `minimum` so calls still get a chance.
+        """
+        value = self.remaining(reserve)
+        if cap is not None:
+            value = min(value, cap)
+        return max(value, minimum)
+
+    def sleep(self, seconds: float, reserve: float = SUBMIT_RESERVE_SECONDS) -> None:
+        """Sleep for `seconds`, cut short so the deadline is never overrun."""
+        time.sleep(max(0.0, min(seconds, self.remaining(reserve))))
+
+    def __repr__(self):
+        return f"Deadline(remaining={self.remaining(reserve=0):.1f}s)"
@@ -0,0 +1,79 @@
+import os
+import base64
+from typing import Dict, Any, Iterator
+from app.logger import get_logger
+
+log = get_logger(__name__)
+
+# Base64 is encoded in chunks that are a multiple of 3 bytes so the pieces
+# concatenate into one valid encoding without padding in the middle.
+B64_CHUNK_SIZE = 3 * 256 * 1024
+
+# Bytes inspected to decide whether a file is text or binary
+SNIFF_SIZE = 8192
+
+
+def _is_binary(sample: bytes) -> bool:
+    """
+    Classify a file from its leading bytes.
+    NUL bytes or invalid UTF-8 mean binary; a multibyte character cut at
+    the end of the sample is tolerated.
+    """
+    if b"\x00" in sample:
+        return True
+    try:
+        sample.decode("utf-8")
+        return False
+    except UnicodeDecodeError as e:
+        # Only the tail of the sample was cut mid-character
+        return e.start < len(sample) - 3
+
+
+def iter_workspace_files(base_dir: str) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily walk `base_dir` and yield one descriptor per file:
+        {"path": rel_path, "abs_path": str, "size": int, "binary": bool}
+    File contents are not loaded here; use `read_file_base64` / `read_file_text`
+    when the file is actually uploaded. The .git folder is skipped.
+    """
+    # Resolve the workspace link once: a swap mid-walk must not mix two trees
+    base_dir = os.path.realpath(base_dir)
+    for root, dirs, files in os.walk(base_dir):
+        dirs[:] = [d for d in dirs if d != ".git"]
+        for f in files:
+            file_path = os.path.join(root, f)
+            rel_path = os.path.relpath(file_path, base_dir).replace(os.sep, "/")
+            try:
+                size = os.path.getsize(file_path)
+                with open(file_path, "rb") as file_obj:
+                    binary = _is_binary(file_obj.read(SNIFF_SIZE))
+            except OSError as e:
+                log.info(f"Skipping unreadable file {rel_path}: {e}")
+                continue
+            yield {"path": rel_path, "abs_path": file_path, "size": size, "binary": binary}
+
+
+def read_file_base64(file_path: str) -> str:
+    """
+    Base64-encode a file in fixed-size chunks. Only one raw chunk is held at a
+    time, but the encoded result (4/3 of the file) is built in memory, so memory
+    is bounded per file rather than flat.
+    """
+    size = os.path.getsize(file_path)
+    if size == 0:
+        return ""
+
+    parts = []
+    with open(file_path, "rb") as file_obj:
+        while True:
+            chunk = file_obj.read(B64_CHUNK_SIZE)
+            if not chunk:
+                break
+            parts.append(base64.b64encode(chunk).decode("ascii"))
+    return "".join(parts)
+
+
+def read_file_text(file_path: str) -> str:
+    """Read a file previously classified as text."""
+    with open(file_path, "r", encoding="utf-8") as file_obj:
+        return file_obj.read()
@@ -1,66 +1,148 @@
 import os
-import json
+import time
+import zlib
+import hashlib
+from xml.sax.saxutils import escape
+from app.database import get_connection
 from app.logger import get_logger
 
 log = get_logger(__name__)
 
-CONTEXT_PATH = os.path.join(os.getcwd(), "app", "data", "context.json")
-
-
-def save_context(context: str, round_number: int) -> None:
+# Rounds kept per task; older rounds (and blobs nothing refers to) are dropped
+CONTEXT_KEEP_ROUNDS = int(os.getenv("CONTEXT_KEEP_ROUNDS", 3))
+
+
+def _put_blob(con, text: str) -> str:
+    """Store `text` once, keyed by its SHA-256; returns the hash."""
+    raw = text.encode("utf-8")
+    digest = hashlib.sha256(raw).hexdigest()
+    con.execute(
+        "INSERT OR IGNORE INTO context_blobs (hash, data) VALUES (?, ?)",
+        (digest, zlib.compress(raw, 6)),
+    )
+    return digest
+
+
+def _get_blob(con, digest: str) -> str:
+    row = con.execute("SELECT data FROM context_blobs WHERE hash = ?", (digest,)).fetchone()
+    return zlib.decompress(row[0]).decode("utf-8") if row else ""
+
+
+def _delete_rounds(con, task: str, rounds) -> None:
+    """Delete the given rounds of `task` and any blobs only they referred to."""
+    rounds = list(rounds)
+    if not rounds:
+        return
+    marks = ",".join("?" for _ in rounds)
+    hashes = {r[0] for r in con.execute(
+        f"SELECT blob_hash FROM context_files WHERE task = ? AND round IN ({marks})", (task, *rounds))}
+    hashes |= {r[0] for r in con.execute(
+        f"SELECT raw_hash FROM context_rounds WHERE task = ? AND round IN ({marks}) AND raw_hash IS NOT NULL",
+        (task, *rounds))}
+    con.execute(f"DELETE FROM context_files WHERE task = ? AND round IN ({marks})", (task, *rounds))
+    con.execute(f"DELETE FROM context_rounds WHERE task = ? AND round IN ({marks})", (task, *rounds))
+    con.executemany(
+        """DELETE FROM context_blobs WHERE hash = ?
+           AND NOT EXISTS (SELECT 1 FROM context_files WHERE blob_hash = ?)
+           AND NOT EXISTS (SELECT 1 FROM context_rounds WHERE raw_hash = ?)""",
+        [(h, h, h) for h in hashes],
+    )
+
+
+def save_context(context: str, round_number: int, task: str, parsed: dict | None = None) -> None:
     """
-    Save the full LLM response (as JSON) to a context file.
-    Clears any previous context if it's the first round.
+    Save the LLM response for `task` / `round_number` as a compressed file set.
+    Clears the task's previous context if it's the first round.
+    `parsed` is the response as the caller already parsed it (parse_llm_output_xml);
+    unchanged files share one blob across rounds. Without it, or when it has no
+    files, the raw text is kept instead.
     """
-
-    # Ensure directory exists
-    os.makedirs(os.path.dirname(CONTEXT_PATH), exist_ok=True)
-
-    # If round 1 → clear old context
-    if round_number == 1 and os.path.exists(CONTEXT_PATH):
-        os.remove(CONTEXT_PATH)
+    if not context:
+        log.info(f"No context to save for {task} (round {round_number}).")
+        return
 
     try:
-        # Convert JSON string to dict if possible
-        if isinstance(context, str):
-            try:
-                context_obj = json.loads(context)
-            except json.JSONDecodeError:
-                # If not valid JSON, save raw string
-                context_obj = {"raw_context": context}
-        else:
-            context_obj = context
-
-        # Write cleanly formatted JSON
-        with open(CONTEXT_PATH, "w", encoding="utf-8") as f:
-            json.dump(context_obj, f, ensure_ascii=False, indent=2)
-
-        log.info(f"Context saved successfully (round {round_number}).")
+        con = get_connection()
+        with con:
+            # If round 1 → clear old context for this task (and any earlier save of this round)
+            if round_number == 1:
+                stale = [r[0] for r in con.execute("SELECT round FROM context_rounds WHERE task = ?", (task,))]
+            else:
+                stale = [round_number]
+            _delete_rounds(con, task, stale)
+
+            raw_hash = None
+            if parsed is None or not parsed["files"]:
+                raw_hash = _put_blob(con, context)
+            else:
+                con.executemany(
+                    """INSERT OR REPLACE INTO context_files (task, round, path, language, blob_hash)
+                       VALUES (?, ?, ?, ?, ?)""",
+                    [(task, round_number, f["path"], f["language"], _put_blob(con, f["content"]))
+                     for f in parsed["files"]],
+                )
+            con.execute(
+                "INSERT OR REPLACE INTO context_rounds (task, round, created_at, raw_hash) VALUES (?, ?, ?, ?)",
+                (task, round_number, time.time(), raw_hash),
+            )
+            # Bounded retention: keep only the newest rounds of this task
+            _delete_rounds(con, task, [r[0] for r in con.execute(
+                "SELECT round FROM context_rounds WHERE task = ? ORDER BY round DESC LIMIT -1 OFFSET ?",
+                (task, CONTEXT_KEEP_ROUNDS))])
+
+        log.info(f"Context saved successfully ({task}, round {round_number}).")
 
     except Exception as e:
         log.info(f"Error saving context: {e}")
 
 
-def load_context() -> str | None:
+def load_context(task: str, before_round: int | None = None) -> str | None:
     """
-    Load the previous context from the context file (if any).
-    Returns the JSON string (not dict) so it can be directly passed into LLM.
+    Load the latest saved context for `task` (only rounds before `before_round`
+    when given), rendered in the same XML file format the LLM produces so it
+    can be passed straight back into the prompt.
     """
-
-    if not os.path.exists(CONTEXT_PATH):
-        log.info("No previous context found. Starting fresh.")
-        return None
-
     try:
-        with open(CONTEXT_PATH, "r", encoding="utf-8") as f:
-            data = f.read().strip()
-
-        if not data:
-            log.info("Context file is empty.")
+        con = get_connection()
+        if before_round is None:
+            row = con.execute(
+                "SELECT round, raw_hash FROM context_rounds WHERE task = ? ORDER BY round DESC LIMIT 1",
+                (task,),
+            ).fetchone()
+        else:
+            row = con.execute(
+                """SELECT round, raw_hash FROM context_rounds WHERE task = ? AND round < ?
+                   ORDER BY round DESC LIMIT 1""",
+                (task, before_round),
+            ).fetchone()
+
+        if row is None:
+            log.info("No previous context found. Starting fresh.")
             return None
 
-        log.info("Loaded previous context successfully.")
-        return data
+        if row["raw_hash"]:
+            log.info(f"Loaded previous raw context (round {row['round']}).")
+            return _get_blob(con, row["raw_hash"])
+
+        files = con.execute(
+            """SELECT f.path, f.language, b.data FROM context_files f
+               JOIN context_blobs b ON b.hash = f.blob_hash
+               WHERE f.task = ? AND f.round = ? ORDER BY f.path""",
+            (task, row["round"]),
+        ).fetchall()
+
+        parts = ["<response>"]
+        for f in files:
+            # A literal "]]>" would end the CDATA section early: split it across two sections
+            content = zlib.decompress(f["data"]).decode("utf-8").replace("]]>", "]]]]><![CDATA[>")
+            parts.append(
+                f"  <file>\n    <path>{escape(f['path'])}</path>\n    <language>{escape(f['language'])}</language>\n"
+                f"    <content><![CDATA[\n{content}\n]]></content>\n  </file>"
+            )
+        parts.append("</response>")
+
+        log.info(f"Loaded previous context successfully (round {row['round']}, {len(files)} files).")
+        return "\n".join(parts)
 
     except Exception as e:
         log.info(f"Error loading context: {e}")
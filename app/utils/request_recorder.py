@@ -0,0 +1,24 @@
+import os
+import json
+import threading
+from app.logger import get_logger
+
+log = get_logger(__name__)
+
+# When set, every accepted /api/generate-app payload is appended to this JSONL file
+# (secret removed) so the traffic can be replayed with benchmarks/replay.py
+REQUEST_LOG_PATH = os.getenv("REQUEST_LOG_PATH", "")
+
+_lock = threading.Lock()
+
+
+def record_request(payload: dict, received_at: float) -> None:
+    """Append one request as {"received_at": ..., "payload": {...}}."""
+    if not REQUEST_LOG_PATH:
+        return
+    entry = {"received_at": received_at, "payload": {k: v for k, v in payload.items() if k != "secret"}}
+    try:
+        with _lock, open(REQUEST_LOG_PATH, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    except OSError as e:
+        log.warning(f"Could not record request: {e}")
@@ -1,4 +1,5 @@
 import os
+import re
 import shutil
 from app.logger import get_logger
 
@@ -55,4 +56,12 @@ def clear_generated_app_folder_by_round(folder_path, round_number):
         elif os.path.isdir(item_path):
             shutil.rmtree(item_path)
 
-    log.info(f"Cleared all files inside '{folder_path}'{' including .git' if clear_git else ' except .git (if present)'}")
\ No newline at end of file
+    log.info(f"Cleared all files inside '{folder_path}'{' including .git' if clear_git else ' except .git (if present)'}")
+
+def workspace_for(task: str, base_dir: str = os.path.join(os.getcwd(), "generated_app")) -> str:
+    """
+    Working folder for one task, so different tasks can be generated and
+    pushed in parallel without touching each other's files.
+    """
+    safe = re.sub(r"[^A-Za-z0-9._-]", "_", task)
+    return os.path.join(base_dir, safe)
@@ -0,0 +1,150 @@
+import os
+import time
+import uuid
+import queue
+import shutil
+import threading
+from app.logger import get_logger
+
+log = get_logger(__name__)
+
+# Trees live in <generated_app>/.trees; each task workspace is a symlink to its current tree
+TREES_DIR_NAME = ".trees"
+
+# Unreferenced trees older than this are removed by the background sweep
+# (younger ones may be staging directories of another worker process)
+WORKSPACE_ORPHAN_AGE_SECONDS = float(os.getenv("WORKSPACE_ORPHAN_AGE_SECONDS", 3600))
+
+# Workspaces of tasks without a new round for this long are removed (their repo and
+# context stay on GitHub and in the job store; a later round starts from a fresh tree)
+WORKSPACE_IDLE_SECONDS = float(os.getenv("WORKSPACE_IDLE_SECONDS", 7 * 86400))
+
+_retired = queue.SimpleQueue()
+_gc_thread = None
+_gc_lock = threading.Lock()
+
+
+def _trees_dir(workspace: str) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(workspace)), TREES_DIR_NAME)
+
+
+def stage_workspace(workspace: str) -> str:
+    """Create an empty staging tree for `workspace` and return its path."""
+    trees = _trees_dir(workspace)
+    os.makedirs(trees, exist_ok=True)
+    staging = os.path.join(trees, f"{os.path.basename(workspace)}-{uuid.uuid4().hex[:12]}")
+    os.mkdir(staging)
+    return staging
+
+
+def commit_workspace(workspace: str, staging: str, keep_git: bool = False) -> None:
+    """
+    Make `staging` the task's workspace with one atomic rename of a symlink.
+    The .git folder of the current tree moves along when `keep_git` is set
+    (rounds > 1). The previous tree is deleted in the background.
+    """
+    current = os.path.realpath(workspace) if os.path.lexists(workspace) else None
+
+    # Older layout: the workspace is a real directory; move it aside first (same filesystem, O(1))
+    if current and not os.path.islink(workspace):
+        legacy = os.path.join(_trees_dir(workspace), f"{os.path.basename(workspace)}-{uuid.uuid4().hex[:12]}")
+        os.rename(workspace, legacy)
+        current = legacy
+
+    if keep_git and current and os.path.isdir(os.path.join(current, ".git")):
+        os.rename(os.path.join(current, ".git"), os.path.join(staging, ".git"))
+
+    link = f"{workspace}.{uuid.uuid4().hex[:8]}.tmp"
+    os.symlink(os.path.relpath(staging, os.path.dirname(os.path.abspath(workspace))), link)
+    os.replace(link, workspace)
+    log.info(f"Workspace {workspace} now points at {os.path.basename(staging)}")
+
+    if current and os.path.realpath(current) != os.path.realpath(staging):
+        retire_tree(current)
+
+
+def discard_staging(staging: str) -> None:
+    """Drop a staging tree that was never committed."""
+    retire_tree(staging)
+
+
+def retire_tree(path: str) -> None:
+    """Queue a tree for deletion by the background collector."""
+    _ensure_gc()
+    _retired.put(path)
+
+
+def sweep_orphans(base_dir: str = os.path.join(os.getcwd(), "generated_app")) -> int:
+    """Queue trees under `base_dir` that no workspace points at (crash leftovers); returns how many."""
+    trees = os.path.join(base_dir, TREES_DIR_NAME)
+    if not os.path.isdir(trees):
+        return 0
+    referenced = {
+        os.path.realpath(entry.path) for entry in os.scandir(base_dir) if entry.is_symlink()
+    }
+    cutoff = time.time() - WORKSPACE_ORPHAN_AGE_SECONDS
+    count = 0
+    for entry in os.scandir(trees):
+        if os.path.realpath(entry.path) not in referenced and entry.stat(follow_symlinks=False).st_mtime < cutoff:
+            retire_tree(entry.path)
+            count += 1
+    return count
+
+
+def sweep_idle_workspaces(base_dir: str = os.path.join(os.getcwd(), "generated_app"),
+                          max_idle: float = WORKSPACE_IDLE_SECONDS) -> int:
+    """
+    Remove the workspaces of tasks whose tree was last swapped more than
+    `max_idle` seconds ago; returns how many. A task being worked on (by any
+    process) is skipped.
+    """
+    # Imported here: app.services imports app.utils
+    from app.services.task_coordinator import coordinator
+
+    if not os.path.isdir(base_dir):
+        return 0
+    cutoff = time.time() - max_idle
+    count = 0
+    for entry in os.scandir(base_dir):
+        # The link is replaced on every swap, so its own mtime is the task's last activity
+        if not entry.is_symlink() or entry.stat(follow_symlinks=False).st_mtime >= cutoff:
+            continue
+        state, token = coordinator.try_acquire(entry.name)
+        if state != "acquired":
+            continue
+        try:
+            tree = os.path.realpath(entry.path)
+            os.unlink(entry.path)
+            retire_tree(tree)
+            count += 1
+        finally:
+            coordinator.release(entry.name, token)
+    if count:
+        log.info(f"Removed {count} idle workspaces.")
+    return count
+
+
+def sweep_workspaces() -> None:
+    """Periodic cleanup: idle task workspaces, then trees nothing points at."""
+    sweep_idle_workspaces()
+    sweep_orphans()
+
+
+def _ensure_gc():
+    global _gc_thread
+    if _gc_thread is None:
+        with _gc_lock:
+            if _gc_thread is None:
+                _gc_thread = threading.Thread(target=_gc_loop, name="workspace-gc", daemon=True)
+                _gc_thread.start()
+
+
+def _gc_loop():
+    while True:
+        path = _retired.get()
+        try:
+            shutil.rmtree(path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            log.warning(f"Could not remove old workspace tree {path}: {e}")
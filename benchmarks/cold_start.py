@@ -0,0 +1,112 @@
+"""
+Cold-start measurement for scale-to-zero deploys.
+
+For each run, in a fresh interpreter and an empty working directory:
+  - time `import app.main`, and check it created no files and loaded none
+    of the lazily imported SDKs;
+  - time from launching uvicorn to the first successful response.
+
+Exits 1 when importing has side effects, loads a lazy SDK, or the median
+import time exceeds --max-import-seconds.
+
+    python -m benchmarks.cold_start --runs 5
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import httpx
+
+from benchmarks.e2e import REPO_ROOT, _free_port, start_app
+from benchmarks.stats import summarize, HEADER, format_row
+
+# Must not be imported by `import app.main` (they are loaded on first use or by the prewarm)
+LAZY_MODULES = ("github", "huggingface_hub", "httpx")
+
+_IMPORT_PROBE = f"""
+import sys, time, json
+start = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {LAZY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def measure_import(workdir: str) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", _IMPORT_PROBE], cwd=workdir, env={**os.environ, "PYTHONPATH": REPO_ROOT},
+        capture_output=True, text=True, check=True,
+    )
+    probe = json.loads(result.stdout.strip().splitlines()[-1])
+    probe["created"] = sorted(os.listdir(workdir))
+    return probe
+
+
+def measure_ready(workdir: str, timeout: float = 30.0, poll: float = 0.01) -> float:
+    """Seconds from launching uvicorn until GET /metrics answers."""
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/metrics"
+    started = time.perf_counter()
+    server = start_app(workdir, {"PREWARM_IMPORTS": os.getenv("PREWARM_IMPORTS", "1")}, port)
+    try:
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"Server exited during startup:\n{server.stderr.read().decode(errors='replace')}")
+            try:
+                if httpx.get(url, timeout=1).status_code == 200:
+                    return time.perf_counter() - started
+            except httpx.HTTPError:
+                pass
+            time.sleep(poll)
+        raise RuntimeError("Server did not become ready in time")
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-seconds", type=float, default=1.0,
+                        help="fail when the median `import app.main` takes longer")
+    parser.add_argument("--json", help="also write the summary to this file")
+    args = parser.parse_args(argv)
+
+    imports, ready, problems = [], [], set()
+    for _ in range(args.runs):
+        workdir = tempfile.mkdtemp(prefix="bench-cold-")
+        try:
+            probe = measure_import(workdir)
+            imports.append(probe["seconds"])
+            if probe["created"]:
+                problems.add(f"import created files: {probe['created']}")
+            if probe["loaded"]:
+                problems.add(f"import loaded lazy modules: {probe['loaded']}")
+            ready.append(measure_ready(workdir))
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    summary = {"import": summarize(imports), "ready": summarize(ready), "problems": sorted(problems)}
+    print("cold start (s)\n" + HEADER)
+    print(format_row("import app.main", summary["import"]))
+    print(format_row("launch to first response", summary["ready"]))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+    if summary["import"]["p50"] > args.max_import_seconds:
+        problems.add(f"median import {summary['import']['p50']:.3f}s > {args.max_import_seconds}s")
+    for problem in sorted(problems):
+        print(f"FAIL {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""
+Event-loop latency while several large jobs do their CPU work.
+
+Each mode runs in a fresh interpreter. `--jobs` worker threads repeatedly
+parse a multi-MB LLM response (parse_llm_output_xml) and base64-encode a
+multi-MB asset the way push_to_github does, while an asyncio ticker records
+how late each 5 ms sleep wakes up. Modes: the CPU pool off (everything
+in-line, holding the GIL) and on (CPU_POOL_WORKERS processes).
+
+With --check, exits 1 when the pool's p99 loop lag exceeds --max-lag-ms.
+
+    python -m benchmarks.cpu_offload --jobs 4 --iterations 5
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.e2e import REPO_ROOT
+from benchmarks.micro import xml_response
+from benchmarks.stats import summarize
+
+TICK_SECONDS = 0.005
+
+
+async def _ticker(stop: asyncio.Event, lags: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        lags.append(time.perf_counter() - start - TICK_SECONDS)
+
+
+def _job(response: str, asset: str, iterations: int):
+    from app.cpu import offload
+    from app.services.llm_service import parse_llm_output_xml
+    from app.utils.file_collector import read_file_base64
+
+    for _ in range(iterations):
+        parse_llm_output_xml(response)
+        offload(read_file_base64, asset, size=os.path.getsize(asset))
+
+
+async def _measure(jobs: int, iterations: int, response: str, asset: str) -> dict:
+    from app.cpu import warm_cpu_pool, shutdown_cpu_pool
+
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, warm_cpu_pool)
+
+    stop, idle, busy = asyncio.Event(), [], []
+    ticker = asyncio.create_task(_ticker(stop, idle))
+    await asyncio.sleep(0.5)
+    stop.set()
+    await ticker
+
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_ticker(stop, busy))
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        await asyncio.gather(*(loop.run_in_executor(executor, _job, response, asset, iterations)
+                               for _ in range(jobs)))
+    wall = time.perf_counter() - started
+    stop.set()
+    await ticker
+    shutdown_cpu_pool()
+    return {"idle_lag": summarize(idle), "busy_lag": summarize(busy), "wall": wall}
+
+
+def child(args):
+    """Runs one mode in this process and prints its result as JSON."""
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    workdir = tempfile.mkdtemp(prefix="bench-cpu-")
+    os.chdir(workdir)
+    asset = os.path.join(workdir, "asset.bin")
+    with open(asset, "wb") as f:
+        f.write(os.urandom(args.asset_mb * 1024 * 1024))
+    response = xml_response(args.files, args.response_mb * 1024 * 1024 // args.files)
+    result = asyncio.run(_measure(args.jobs, args.iterations, response, asset))
+    print(json.dumps(result))
+
+
+def run_mode(args, workers: int) -> dict:
+    env = {**os.environ, "PYTHONPATH": REPO_ROOT, "LOG_LEVEL": "WARNING", "CPU_POOL_WORKERS": str(workers)}
+    command = [sys.executable, "-m", "benchmarks.cpu_offload", "--child", "--jobs", str(args.jobs),
+               "--iterations", str(args.iterations), "--response-mb", str(args.response_mb),
+               "--asset-mb", str(args.asset_mb), "--files", str(args.files)]
+    result = subprocess.run(command, cwd=REPO_ROOT, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Benchmark child failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=4, help="concurrent jobs (threads)")
+    parser.add_argument("--iterations", type=int, default=5, help="parse + encode rounds per job")
+    parser.add_argument("--response-mb", type=int, default=4, help="size of the LLM response to parse")
+    parser.add_argument("--asset-mb", type=int, default=4, help="size of the asset to base64-encode")
+    parser.add_argument("--files", type=int, default=40, help="files in the LLM response")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1),
+                        help="CPU_POOL_WORKERS for the pooled run")
+    parser.add_argument("--check", action="store_true")
+    parser.add_argument("--max-lag-ms", type=float, default=50.0)
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        child(args)
+        return 0
+
+    results = {"in-line": run_mode(args, 0), f"pool x{args.workers}": run_mode(args, args.workers)}
+    print(f"{args.jobs} jobs x {args.iterations} iterations, {args.response_mb} MB response, "
+          f"{args.asset_mb} MB asset ({os.cpu_count()} CPUs)")
+    print(f"{'mode':<12} {'idle p99 ms':>12} {'busy p50 ms':>12} {'busy p99 ms':>12} {'busy max ms':>12} "
+          f"{'wall s':>8}")
+    for mode, r in results.items():
+        print(f"{mode:<12} {r['idle_lag']['p99'] * 1000:>12.2f} {r['busy_lag']['p50'] * 1000:>12.2f} "
+              f"{r['busy_lag']['p99'] * 1000:>12.2f} {r['busy_lag']['max'] * 1000:>12.2f} {r['wall']:>8.2f}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.check:
+        pooled = results[f"pool x{args.workers}"]["busy_lag"]["p99"] * 1000
+        if pooled > args.max_lag_ms:
+            print(f"FAIL pooled p99 loop lag {pooled:.1f} ms > {args.max_lag_ms} ms")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
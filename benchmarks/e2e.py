@@ -0,0 +1,244 @@
+"""
+Offline end-to-end benchmark.
+
+Starts the AIPipe, GitHub and evaluation stubs, runs the app under uvicorn in
+a scratch directory pointed at them, drives /api/generate-app at a fixed
+concurrency and reports throughput, end-to-end latency percentiles and a
+per-stage breakdown taken from the job records.
+
+    python -m benchmarks.e2e --tasks 40 --concurrency 8 --llm-latency 1.0
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import shutil
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+
+from benchmarks.stats import summarize, HEADER, format_row
+from benchmarks.stubs import Behaviour, AIPipeStub, GitHubStub, EvaluationStub
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SECRET = "bench-secret"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_app(workdir: str, env_overrides: dict, port: int) -> subprocess.Popen:
+    """Run app.main under uvicorn with its data, logs and workspaces inside `workdir`."""
+    env = {**os.environ, **env_overrides, "PYTHONPATH": REPO_ROOT}
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+
+
+def wait_ready(base_url: str, process: subprocess.Popen, timeout: float = 30.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited during startup:\n{process.stderr.read().decode(errors='replace')}")
+        try:
+            if httpx.get(f"{base_url}/metrics", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError("Server did not become ready in time")
+
+
+def make_payload(task: str, round_number: int, evaluation_url: str) -> dict:
+    return {
+        "email": "bench@example.com",
+        "secret": SECRET,
+        "task": task,
+        "round": round_number,
+        "nonce": uuid.uuid4().hex,
+        "brief": "Create a single page that shows the current date in a heading.",
+        "checks": ["Page has an <h1>", "Date is visible"],
+        "evaluation_url": evaluation_url,
+        "attachments": [],
+    }
+
+
+def fetch_job(client: httpx.Client, base_url: str, job_id: str, timeout: float = 5.0):
+    """Job record once its trace has been written (or whatever is there at the timeout)."""
+    end = time.time() + timeout
+    record = None
+    while time.time() < end:
+        response = client.get(f"{base_url}/api/jobs/{job_id}")
+        if response.status_code == 200:
+            record = response.json()
+            if record.get("trace"):
+                return record
+        time.sleep(0.1)
+    return record
+
+
+def run_job(client, base_url, evaluation, payload, timeout) -> dict:
+    """Submit one request and wait for its evaluation; returns the measurements."""
+    result = {"task": payload["task"], "round": payload["round"], "ok": False}
+    sent_at = time.time()
+    try:
+        response = client.post(f"{base_url}/api/generate-app", json=payload)
+    except httpx.HTTPError as e:
+        result["error"] = f"request failed: {e}"
+        return result
+    result["admission"] = time.time() - sent_at
+    if response.status_code != 200:
+        result["error"] = f"HTTP {response.status_code}"
+        return result
+    job_id = response.json()["job_id"]
+    result["job_id"] = job_id
+
+    received = evaluation.wait_for(payload["nonce"], timeout)
+    if received is None:
+        result["error"] = "no evaluation before timeout"
+        return result
+    result["end_to_end"] = received[0] - sent_at
+    result["ok"] = bool(received[1].get("commit_sha"))
+    if not result["ok"]:
+        result["error"] = "evaluation without commit"
+
+    record = fetch_job(client, base_url, job_id) or {}
+    result["stages"] = record.get("stage_durations") or {}
+    spans = {}
+    for span in (record.get("trace") or {}).get("spans", []):
+        spans[span["name"]] = spans.get(span["name"], 0.0) + span["duration"]
+    result["spans"] = spans
+    return result
+
+
+def run_task(client, base_url, evaluation, task, rounds, timeout):
+    """Rounds of one task are sent in order, each after the previous one was evaluated."""
+    return [run_job(client, base_url, evaluation, make_payload(task, r, evaluation.url + "/evaluate"), timeout)
+            for r in range(1, rounds + 1)]
+
+
+def report(results, wall_seconds: float) -> dict:
+    ok = [r for r in results if r["ok"]]
+    stage_values, span_values = {}, {}
+    for r in ok:
+        for name, seconds in r.get("stages", {}).items():
+            stage_values.setdefault(name, []).append(seconds)
+        for name, seconds in r.get("spans", {}).items():
+            span_values.setdefault(name, []).append(seconds)
+    errors = {}
+    for r in results:
+        if not r["ok"]:
+            errors[r.get("error", "unknown")] = errors.get(r.get("error", "unknown"), 0) + 1
+    return {
+        "jobs": len(results),
+        "succeeded": len(ok),
+        "errors": errors,
+        "wall_seconds": wall_seconds,
+        "throughput_jobs_per_s": len(ok) / wall_seconds if wall_seconds else 0.0,
+        "admission": summarize([r["admission"] for r in results if "admission" in r]),
+        "end_to_end": summarize([r["end_to_end"] for r in results if "end_to_end" in r]),
+        "stages": {k: summarize(v) for k, v in sorted(stage_values.items())},
+        "spans": {k: summarize(v) for k, v in sorted(span_values.items())},
+    }
+
+
+def print_report(summary: dict):
+    print(f"jobs: {summary['jobs']}  succeeded: {summary['succeeded']}  "
+          f"wall: {summary['wall_seconds']:.2f}s  throughput: {summary['throughput_jobs_per_s']:.2f} jobs/s")
+    if summary["errors"]:
+        print(f"errors: {summary['errors']}")
+    print("\nlatency (s)\n" + HEADER)
+    print(format_row("admission", summary["admission"]))
+    print(format_row("end_to_end", summary["end_to_end"]))
+    print("\nstages (s)\n" + HEADER)
+    for name, s in summary["stages"].items():
+        print(format_row(name, s))
+    print("\nspans, summed per job (s)\n" + HEADER)
+    for name, s in summary["spans"].items():
+        print(format_row(name, s))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=20, help="number of tasks to run")
+    parser.add_argument("--rounds", type=int, default=1, help="rounds sent per task, in order")
+    parser.add_argument("--concurrency", type=int, default=4, help="tasks in flight at once")
+    parser.add_argument("--workers", type=int, default=4, help="JOB_WORKERS for the server")
+    parser.add_argument("--timeout", type=float, default=300.0, help="seconds to wait for each evaluation")
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--llm-jitter", type=float, default=0.1)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--files", type=int, default=5, help="files in each LLM response")
+    parser.add_argument("--file-bytes", type=int, default=2_000, help="size of each generated file")
+    parser.add_argument("--github-latency", type=float, default=0.05)
+    parser.add_argument("--github-jitter", type=float, default=0.02)
+    parser.add_argument("--github-failure-rate", type=float, default=0.0)
+    parser.add_argument("--eval-latency", type=float, default=0.02)
+    parser.add_argument("--eval-failure-rate", type=float, default=0.0)
+    parser.add_argument("--json", help="also write the summary to this file")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch directory (db, logs, workspaces)")
+    args = parser.parse_args(argv)
+
+    aipipe = AIPipeStub(Behaviour(args.llm_latency, args.llm_jitter, args.llm_failure_rate),
+                        files=args.files, file_bytes=args.file_bytes).start()
+    github = GitHubStub(Behaviour(args.github_latency, args.github_jitter, args.github_failure_rate, 502)).start()
+    evaluation = EvaluationStub(Behaviour(args.eval_latency, 0.0, args.eval_failure_rate, 503)).start()
+
+    workdir = tempfile.mkdtemp(prefix="bench-e2e-")
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = start_app(workdir, {
+        "SECRET_KEY": SECRET,
+        "AIPIPE_URL": aipipe.responses_url,
+        "AIPIPE_TOKEN": "bench",
+        "HF_API_TOKEN": "",
+        "GITHUB_API_URL": github.url,
+        "GITHUB_TOKEN": "bench",
+        "GITHUB_USERNAME": github.owner,
+        "JOB_WORKERS": str(args.workers),
+    }, port)
+    try:
+        wait_ready(base_url, server)
+        run_id = uuid.uuid4().hex[:6]
+        results = []
+        with httpx.Client(timeout=30) as client, ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            started = time.time()
+            futures = [pool.submit(run_task, client, base_url, evaluation, f"bench-{run_id}-{i}",
+                                   args.rounds, args.timeout) for i in range(args.tasks)]
+            for future in futures:
+                results.extend(future.result())
+            wall = time.time() - started
+
+        summary = report(results, wall)
+        summary["config"] = vars(args)
+        summary["stub_requests"] = {"aipipe": aipipe.requests, "github": github.requests,
+                                    "evaluation": evaluation.requests}
+        print_report(summary)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(summary, f, indent=2)
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+        for stub in (aipipe, github, evaluation):
+            stub.stop()
+        if args.keep:
+            print(f"\nscratch directory: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""
+Microbenchmarks for the CPU/I/O hot spots inside a job: build_prompt_xml,
+save_llm_output_xml, save_llm_output, clear_generated_app_folder_by_round and
+the staged workspace swap that replaced it on the job path.
+
+Fixtures are generated (100-file responses, multi-MB CDATA, several
+<response> roots, deep directory trees). Each case reports median/min time
+and peak traced allocations. Save a baseline on the reference commit and
+check later runs against it; a case slower (relative to a calibration
+workload run alongside) or heavier than the baseline by more than the
+threshold fails the run.
+
+    python -m benchmarks.micro --save-baseline
+    python -m benchmarks.micro --check --threshold 0.25
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+DEFAULT_BASELINE = os.path.join(RESULTS_DIR, "micro_baseline.json")
+
+# Memory is far less noisy than time; it gets its own (smaller) default threshold
+DEFAULT_TIME_THRESHOLD = 0.25
+DEFAULT_MEMORY_THRESHOLD = 0.10
+
+
+# ---------------- Fixtures ----------------
+
+def _content(size: int, seed: str) -> str:
+    line = f"console.log('{seed}: generated line of the benchmark fixture');\n"
+    return (line * (size // len(line) + 1))[:size]
+
+
+def _file_xml(path: str, content: str, language: str = "javascript") -> str:
+    return (f"  <file>\n    <path>{path}</path>\n    <language>{language}</language>\n"
+            f"    <content><![CDATA[\n{content}\n]]></content>\n  </file>")
+
+
+def xml_response(files: int, size: int, depth: int = 0, roots: int = 1) -> str:
+    """LLM-style response with `files` files of `size` bytes, nested `depth` dirs, split over `roots` <response>s."""
+    per_root = max(1, files // roots)
+    parts = []
+    for r in range(roots):
+        body = []
+        for i in range(r * per_root, min(files, (r + 1) * per_root)):
+            folder = "/".join(f"d{i % 7}_{level}" for level in range(depth))
+            path = f"{folder}/file_{i}.js" if folder else f"file_{i}.js"
+            body.append(_file_xml(path, _content(size, path)))
+        body.append("  <run_command>npm start</run_command>")
+        parts.append("<response>\n" + "\n".join(body) + "\n</response>")
+    return "```xml\n" + "\n".join(parts) + "\n```"
+
+
+def json_response(files: int, size: int) -> str:
+    data = {"files": [{"path": f"src/file_{i}.js", "language": "javascript", "content": _content(size, str(i))}
+                      for i in range(files)], "run_command": "npm start"}
+    return "```json\n" + json.dumps(data) + "\n```"
+
+
+def make_tree(root: str, files: int, depth: int, size: int = 256, with_git: bool = True):
+    """Workspace with `files` files spread over directories `depth` levels deep (and a .git dir)."""
+    os.makedirs(root, exist_ok=True)
+    payload = "x" * size
+    for i in range(files):
+        folder = os.path.join(root, *(f"d{i % 5}_{level}" for level in range(depth)))
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, f"f{i}.txt"), "w") as f:
+            f.write(payload)
+    if with_git:
+        make_tree(os.path.join(root, ".git"), files // 4, 2, size, with_git=False)
+
+
+# ---------------- Cases ----------------
+
+def build_cases(workdir: str):
+    """[(name, setup, run)]; setup() returns the argument for run() and is not timed."""
+    from app.services.llm_service import build_prompt_xml, save_llm_output_xml, save_llm_output
+    from app.utils.utilities import clear_generated_app_folder_by_round
+    from app.utils.workspace import stage_workspace, commit_workspace
+
+    out = os.path.join(workdir, "out")
+
+    def fresh_out():
+        shutil.rmtree(out, ignore_errors=True)
+        return out
+
+    small_context = xml_response(10, 1_000)
+    large_context = xml_response(100, 20_000)
+    attachments = [{"name": f"image_{i}.png", "url": "data:image/png;base64," + "A" * 50_000} for i in range(10)]
+    checks = [f"Check number {i} must pass" for i in range(50)]
+
+    def prompt(context, atts):
+        return lambda _: build_prompt_xml("Build a dashboard with charts.", atts, checks, 2, context)
+
+    xml_100 = xml_response(100, 2_000)
+    xml_mb = xml_response(3, 3_000_000)
+    xml_roots = xml_response(100, 2_000, roots=5)
+    xml_deep = xml_response(100, 1_000, depth=12)
+    json_100 = json_response(100, 2_000)
+    json_mb = json_response(3, 3_000_000)
+
+    tree = os.path.join(workdir, "tree")
+
+    def tree_setup(files, depth):
+        def setup():
+            shutil.rmtree(tree, ignore_errors=True)
+            make_tree(tree, files, depth)
+            return tree
+        return setup
+
+    workspace = os.path.join(workdir, "generated_app", "task")
+
+    def workspace_setup(files, depth):
+        def setup():
+            if os.path.islink(workspace):
+                os.unlink(workspace)
+            make_tree(workspace, files, depth)
+            return workspace
+        return setup
+
+    def swap(ws):
+        commit_workspace(ws, stage_workspace(ws), keep_git=True)
+
+    return [
+        ("build_prompt_xml/small", None, prompt(small_context, [])),
+        ("build_prompt_xml/2MB_context", None, prompt(large_context, attachments)),
+        ("save_llm_output_xml/100_files", fresh_out, lambda d: save_llm_output_xml(xml_100, base_dir=d)),
+        ("save_llm_output_xml/3x3MB_cdata", fresh_out, lambda d: save_llm_output_xml(xml_mb, base_dir=d)),
+        ("save_llm_output_xml/5_roots", fresh_out, lambda d: save_llm_output_xml(xml_roots, base_dir=d)),
+        ("save_llm_output_xml/deep_tree", fresh_out, lambda d: save_llm_output_xml(xml_deep, base_dir=d)),
+        ("save_llm_output/100_files", fresh_out, lambda d: save_llm_output(json_100, base_dir=d)),
+        ("save_llm_output/3x3MB", fresh_out, lambda d: save_llm_output(json_mb, base_dir=d)),
+        ("clear_by_round/round1_500_files", tree_setup(500, 4),
+         lambda d: clear_generated_app_folder_by_round(d, 1)),
+        ("clear_by_round/round2_deep_2000_files", tree_setup(2_000, 10),
+         lambda d: clear_generated_app_folder_by_round(d, 2)),
+        ("workspace_swap/round2_deep_2000_files", workspace_setup(2_000, 10), swap),
+    ]
+
+
+def calibrate(repeat: int = 7) -> float:
+    """
+    Best time of a fixed CPU + file workload. Times are compared relative to it,
+    so a uniformly slower (or faster) machine does not read as a regression.
+    """
+    blob = json.dumps({"k": list(range(20_000))})
+    best = float("inf")
+    with tempfile.TemporaryDirectory() as tmp:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for i in range(50):
+                json.loads(blob)
+                with open(os.path.join(tmp, f"c{i}"), "w") as f:
+                    f.write(blob)
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure(setup, run, repeat: int, warmup: int = 1) -> dict:
+    times = []
+    for i in range(warmup + repeat):
+        arg = setup() if setup else None
+        start = time.perf_counter()
+        run(arg)
+        elapsed = time.perf_counter() - start
+        if i >= warmup:
+            times.append(elapsed)
+
+    # Peak allocations in a separate run: tracemalloc itself slows the code down
+    arg = setup() if setup else None
+    tracemalloc.start()
+    try:
+        run(arg)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"median": statistics.median(times), "min": min(times), "peak_bytes": peak}
+
+
+# ---------------- Baseline ----------------
+
+def _relative_time(case: dict, calibration: float) -> float:
+    # min is the least noisy estimate of a function's cost
+    return case["min"] / calibration
+
+
+def compare(results: dict, calibration: float, baseline: dict, time_threshold: float, memory_threshold: float):
+    """Regressions as [(case, metric, baseline, current, ratio)]; times are calibration-relative."""
+    regressions = []
+    for name, current in results.items():
+        base = baseline["cases"].get(name)
+        if not base:
+            continue
+        checks = (
+            ("time", _relative_time(base, baseline["calibration"]), _relative_time(current, calibration),
+             time_threshold),
+            ("peak_bytes", base["peak_bytes"], current["peak_bytes"], memory_threshold),
+        )
+        for metric, before, after, threshold in checks:
+            if before and after > before * (1 + threshold):
+                regressions.append((name, metric, before, after, after / before))
+    return regressions
+
+
+def print_results(results: dict, calibration: float, baseline: dict | None):
+    print(f"calibration: {calibration * 1000:.2f} ms"
+          + (f" (baseline {baseline['calibration'] * 1000:.2f} ms)" if baseline else ""))
+    print(f"{'case':<40} {'median ms':>10} {'min ms':>9} {'peak KB':>10} {'vs base':>9}")
+    for name, r in results.items():
+        base = baseline and baseline["cases"].get(name)
+        delta = "-"
+        if base and base["min"]:
+            ratio = _relative_time(r, calibration) / _relative_time(base, baseline["calibration"])
+            delta = f"{ratio - 1:+.0%}"
+        print(f"{name:<40} {r['median'] * 1000:>10.2f} {r['min'] * 1000:>9.2f} "
+              f"{r['peak_bytes'] / 1024:>10.0f} {delta:>9}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--filter", default="", help="only run cases whose name contains this")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--check", action="store_true", help="exit 1 when a case regressed past the threshold")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_TIME_THRESHOLD,
+                        help="allowed slowdown of the best time relative to calibration (0.25 = 25%%)")
+    parser.add_argument("--memory-threshold", type=float, default=DEFAULT_MEMORY_THRESHOLD,
+                        help="allowed growth of peak allocations")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    elif args.check:
+        parser.error(f"no baseline at {args.baseline}; run with --save-baseline first")
+
+    # Measure the functions, not the per-file log lines they emit
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    # Time the code in-process: large cases would otherwise go through the CPU pool
+    # (benchmarks.cpu_offload measures that), which the baselines predate
+    os.environ.setdefault("CPU_POOL_WORKERS", "0")
+    # The app writes logs/ and app/data/ under the working directory: keep them out of the tree
+    workdir = tempfile.mkdtemp(prefix="bench-micro-")
+    cwd = os.getcwd()
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    os.chdir(workdir)
+    try:
+        calibration = calibrate()
+        results = {}
+        for name, setup, run in build_cases(workdir):
+            if args.filter in name:
+                results[name] = measure(setup, run, args.repeat)
+        calibration = min(calibration, calibrate())
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_results(results, calibration, baseline)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "saved_at": time.time(),
+                       "calibration": calibration, "cases": results}, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+
+    if args.check:
+        regressions = compare(results, calibration, baseline, args.threshold, args.memory_threshold)
+        for name, metric, before, after, ratio in regressions:
+            print(f"REGRESSION {name}: {metric} {before:.6g} -> {after:.6g} ({ratio - 1:+.0%})")
+        if regressions:
+            return 1
+        print("\nNo regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""
+Prompt prefix stability check.
+
+Provider-side prompt caching only hits when the start of the prompt is
+byte-identical across requests. For every template version this checks that:
+  - the static prefix hashes to the value pinned below (edit a template ->
+    add a new version instead, and pin its hash);
+  - the prefix is the same in a fresh interpreter with another hash seed;
+  - prompts built from very different jobs all start with that prefix, and
+    nothing from the job leaks into it.
+
+Also prints the prefix size against the provider's minimum cacheable prompt.
+Exits 1 on any failure.
+
+    python -m benchmarks.prompt_prefix
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+from benchmarks.e2e import REPO_ROOT
+
+# version -> sha256 of its static prefix
+PINNED_PREFIX_SHA256 = {
+    "v1": "7709f027720f7fb988cd41d6d9d6c692916ff41243f2ffa24ebfd4ed1ac5b4f5",
+}
+
+# OpenAI only caches prompts from this many tokens on; ~4 characters per token
+DEFAULT_MIN_CACHEABLE_TOKENS = 1024
+
+_HASH_PROBE = """
+import json
+from app.services.prompt_templates import PROMPT_TEMPLATES, prefix_sha256
+print(json.dumps({v: prefix_sha256(v) for v in PROMPT_TEMPLATES}))
+"""
+
+_MARKER = "JOB-MARKER-7f3a"
+
+
+def _jobs():
+    """Varied build_prompt_xml arguments; every dynamic value carries _MARKER."""
+    big_context = f"<response><file><path>{_MARKER}.js</path></file></response>" * 5_000
+    return [
+        (f"Build a todo app {_MARKER}", [], [f"Check {_MARKER}"], 1, None),
+        (f"Brief with {{braces}} and ]]> {_MARKER}", [{"name": f"{_MARKER}.png", "url": "data:image/png;base64,AAAA"}],
+         [], 2, big_context),
+        ("", [], [], 3, f"ctx {_MARKER}"),
+    ]
+
+
+def check(versions, min_tokens: int) -> list:
+    from app.services.llm_service import build_prompt_xml
+    from app.services.prompt_templates import static_prefix, prefix_sha256
+
+    problems = []
+    result = subprocess.run(
+        [sys.executable, "-c", _HASH_PROBE], capture_output=True, text=True, check=True,
+        env={**os.environ, "PYTHONPATH": REPO_ROOT, "PYTHONHASHSEED": "12345", "LOG_LEVEL": "WARNING"},
+    )
+    fresh = json.loads(result.stdout.strip().splitlines()[-1])
+
+    for version in versions:
+        prefix = static_prefix(version)
+        digest = prefix_sha256(version)
+        tokens = len(prefix) // 4
+        print(f"{version}: {len(prefix.encode('utf-8'))} bytes, ~{tokens} tokens, sha256 {digest}")
+
+        pinned = PINNED_PREFIX_SHA256.get(version)
+        if pinned is None:
+            problems.append(f"{version}: no pinned hash; add {digest!r} to PINNED_PREFIX_SHA256")
+        elif pinned != digest:
+            problems.append(f"{version}: prefix changed ({pinned[:12]} -> {digest[:12]}); "
+                            f"put the edit in a new template version")
+        if fresh.get(version) != digest:
+            problems.append(f"{version}: prefix differs in a fresh interpreter")
+        if _MARKER in prefix:
+            problems.append(f"{version}: job data leaked into the prefix")
+        for args in _jobs():
+            if not build_prompt_xml(*args, version=version).startswith(prefix):
+                problems.append(f"{version}: prompt for round {args[3]} does not start with the static prefix")
+        if tokens < min_tokens:
+            print(f"  note: prefix is below the provider's {min_tokens}-token minimum; only prompts that share "
+                  f"more than that (e.g. a retried job) get cache hits")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--version", action="append", help="template version to check (default: all)")
+    parser.add_argument("--min-cacheable-tokens", type=int, default=DEFAULT_MIN_CACHEABLE_TOKENS)
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    from app.services.prompt_templates import PROMPT_TEMPLATES
+
+    problems = check(args.version or list(PROMPT_TEMPLATES), args.min_cacheable_tokens)
+    for problem in problems:
+        print(f"FAIL {problem}")
+    if not problems:
+        print("Prompt prefixes are stable.")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
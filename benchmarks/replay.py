@@ -0,0 +1,258 @@
+"""
+Replay recorded /api/generate-app traffic against a running server.
+
+Input is JSONL: either bare User_json payloads, or the
+{"received_at": ..., "payload": {...}} lines written by the server when
+REQUEST_LOG_PATH is set. Lines that are not request payloads are skipped.
+
+Arrivals are open-loop: requests are sent on schedule whether or not
+earlier jobs have finished. The schedule follows the recorded timestamps
+(`--speed` compresses it) or a Poisson process at `--rate` requests/s.
+Rounds of the same task keep their recorded order: a round is never sent
+before the previous round of its task was admitted.
+
+    python -m benchmarks.replay traffic.jsonl --url http://127.0.0.1:8000 \\
+        --secret $SECRET_KEY --evaluation-url http://127.0.0.1:9000/evaluate --rate 2
+"""
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import httpx
+
+from benchmarks.stats import summarize, HEADER, format_row
+
+REQUIRED_FIELDS = ("email", "task", "round", "nonce", "brief", "checks", "evaluation_url", "attachments")
+TERMINAL_STATUSES = ("completed", "superseded", "failed")
+# Outbox states after which the evaluation is never sent again
+DELIVERY_STATUSES = ("delivered", "failed")
+
+
+def load_requests(path: str):
+    """[(recorded_at or None, payload)] in file order, and the number of skipped lines."""
+    entries, skipped = [], 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError:
+                skipped += 1
+                continue
+            payload = item.get("payload", item) if isinstance(item, dict) else None
+            if not isinstance(payload, dict) or any(k not in payload for k in REQUIRED_FIELDS):
+                skipped += 1
+                continue
+            entries.append((item.get("received_at"), payload))
+    return entries, skipped
+
+
+def schedule(entries, rate: float | None, speed: float, seed: int | None = None):
+    """Send offsets (seconds from start) for each entry."""
+    timestamps = [t for t, _ in entries]
+    if rate is None and all(t is not None for t in timestamps):
+        first = timestamps[0]
+        return [max(0.0, (t - first) / speed) for t in timestamps]
+    rng = random.Random(seed)
+    rate = rate or 1.0
+    offsets, now = [], 0.0
+    for _ in entries:
+        offsets.append(now)
+        now += rng.expovariate(rate)
+    return offsets
+
+
+def prepare(payload: dict, args, run_id: str) -> dict:
+    """Copy of a recorded payload made safe to replay (own secret, tasks, nonce and evaluator)."""
+    payload = dict(payload)
+    payload["secret"] = args.secret
+    payload["task"] = f"{args.task_prefix}{run_id}-{payload['task']}"
+    payload["nonce"] = uuid.uuid4().hex
+    if args.evaluation_url:
+        payload["evaluation_url"] = args.evaluation_url
+    return payload
+
+
+async def wait_completion(client, base_url, job_id, timeout, poll_interval):
+    """Terminal status of the job, or None when it did not finish within `timeout`."""
+    end = time.time() + timeout
+    while time.time() < end:
+        try:
+            response = await client.get(f"{base_url}/api/jobs/{job_id}")
+            if response.status_code == 200 and response.json().get("status") in TERMINAL_STATUSES:
+                return response.json()["status"]
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(poll_interval)
+    return None
+
+
+async def wait_delivery(client, base_url, job_id, timeout, poll_interval):
+    """
+    Final outbox status of the job's evaluation ("delivered" or "failed"), or
+    None when it was not settled within `timeout`. A "completed" job has only
+    queued its evaluation; delivery is what the evaluator sees.
+    """
+    end = time.time() + timeout
+    while time.time() < end:
+        try:
+            response = await client.get(f"{base_url}/api/jobs/{job_id}/evaluation")
+            if response.status_code == 200 and response.json().get("status") in DELIVERY_STATUSES:
+                return response.json()["status"]
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(poll_interval)
+    return None
+
+
+async def send(client, args, payload, offset, started, previous, admitted, results):
+    """Send one request at `offset`, after the previous round of its task was admitted."""
+    await asyncio.sleep(max(0.0, started + offset - time.time()))
+    if previous is not None:
+        await previous.wait()
+
+    result = {"task": payload["task"], "round": payload["round"], "scheduled": offset,
+              "lag": time.time() - started - offset}
+    results.append(result)
+    sent_at = time.time()
+    try:
+        response = await client.post(f"{args.url}/api/generate-app", json=payload)
+    except httpx.HTTPError as e:
+        result["error"] = f"request failed: {type(e).__name__}"
+        admitted.set()
+        return
+    result["admission"] = time.time() - sent_at
+    admitted.set()
+    if response.status_code != 200:
+        result["error"] = f"HTTP {response.status_code}"
+        return
+
+    job_id = response.json()["job_id"]
+    deadline = sent_at + args.timeout
+    status = await wait_completion(client, args.url, job_id, deadline - time.time(), args.poll_interval)
+    if status is None:
+        result["error"] = "timeout"
+        return
+    result["status"] = status
+    if status == "failed":
+        result["error"] = "job failed"
+        return
+    if status == "completed":
+        delivery = await wait_delivery(client, args.url, job_id, deadline - time.time(), args.poll_interval)
+        if delivery is None:
+            result["error"] = "evaluation not delivered before timeout"
+            return
+        if delivery == "failed":
+            result["error"] = "evaluation delivery failed"
+            return
+    # Up to the evaluation reaching the evaluator (or the job being superseded)
+    result["completion"] = time.time() - sent_at
+
+
+async def replay(entries, offsets, args, run_id: str):
+    results = []
+    last_admitted = {}  # task -> Event of its latest scheduled round
+    limits = httpx.Limits(max_connections=args.max_connections)
+    async with httpx.AsyncClient(timeout=args.request_timeout, limits=limits) as client:
+        started = time.time()
+        jobs = []
+        for (_, recorded), offset in zip(entries, offsets):
+            payload = prepare(recorded, args, run_id)
+            admitted = asyncio.Event()
+            previous = last_admitted.get(payload["task"])
+            last_admitted[payload["task"]] = admitted
+            jobs.append(send(client, args, payload, offset, started, previous, admitted, results))
+        await asyncio.gather(*jobs)
+        wall = time.time() - started
+    return results, wall
+
+
+def report(results, wall: float, skipped: int) -> dict:
+    by_round = {}
+    for r in results:
+        by_round.setdefault(r["round"], []).append(r)
+    errors = {}
+    for r in results:
+        if "error" in r:
+            errors[r["error"]] = errors.get(r["error"], 0) + 1
+    return {
+        "requests": len(results),
+        "skipped_lines": skipped,
+        "wall_seconds": wall,
+        "offered_rate": len(results) / max(results[-1]["scheduled"], 1e-9) if len(results) > 1 else None,
+        "error_rate": sum(errors.values()) / len(results) if results else 0.0,
+        "errors": errors,
+        "statuses": {s: sum(1 for r in results if r.get("status") == s) for s in TERMINAL_STATUSES},
+        "send_lag": summarize([r["lag"] for r in results]),
+        "admission": summarize([r["admission"] for r in results if "admission" in r]),
+        "completion": summarize([r["completion"] for r in results if "completion" in r]),
+        "completion_by_round": {
+            str(n): summarize([r["completion"] for r in rs if "completion" in r]) for n, rs in sorted(by_round.items())
+        },
+    }
+
+
+def print_report(summary: dict):
+    offered = summary["offered_rate"]
+    print(f"requests: {summary['requests']}  skipped lines: {summary['skipped_lines']}  "
+          f"wall: {summary['wall_seconds']:.2f}s  offered: {f'{offered:.2f} req/s' if offered else '-'}")
+    print(f"error rate: {summary['error_rate']:.1%}  errors: {summary['errors'] or '-'}  "
+          f"statuses: {summary['statuses']}")
+    print("\nlatency (s)\n" + HEADER)
+    print(format_row("send lag", summary["send_lag"]))
+    print(format_row("admission", summary["admission"]))
+    print(format_row("completion", summary["completion"]))
+    for n, s in summary["completion_by_round"].items():
+        print(format_row(f"completion round {n}", s))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="JSONL file of recorded requests")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="server base URL")
+    parser.add_argument("--secret", required=True, help="secret of the target server")
+    parser.add_argument("--evaluation-url", help="send evaluations here instead of the recorded URLs")
+    parser.add_argument("--keep-evaluation-url", action="store_true",
+                        help="allow submitting to the recorded evaluation URLs")
+    parser.add_argument("--task-prefix", default="replay-", help="prefix for replayed task names (repo names)")
+    parser.add_argument("--rate", type=float, help="open-loop Poisson arrivals per second instead of recorded timing")
+    parser.add_argument("--speed", type=float, default=1.0, help="recorded timing is divided by this factor")
+    parser.add_argument("--seed", type=int, help="seed for --rate arrivals")
+    parser.add_argument("--limit", type=int, help="replay only the first N requests")
+    parser.add_argument("--timeout", type=float, default=900.0, help="seconds to wait for each job to finish")
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    parser.add_argument("--request-timeout", type=float, default=30.0)
+    parser.add_argument("--max-connections", type=int, default=100)
+    parser.add_argument("--json", help="also write the summary to this file")
+    args = parser.parse_args(argv)
+
+    if not args.evaluation_url and not args.keep_evaluation_url:
+        parser.error("pass --evaluation-url (or --keep-evaluation-url to submit to the recorded evaluators)")
+
+    entries, skipped = load_requests(args.path)
+    if args.limit:
+        entries = entries[:args.limit]
+    if not entries:
+        print(f"No request payloads found in {args.path} ({skipped} lines skipped).", file=sys.stderr)
+        return 1
+
+    offsets = schedule(entries, args.rate, args.speed, args.seed)
+    results, wall = asyncio.run(replay(entries, offsets, args, uuid.uuid4().hex[:6]))
+    results.sort(key=lambda r: r["scheduled"])
+    summary = report(results, wall, skipped)
+    # The secret must not end up in a report file
+    summary["config"] = {key: value for key, value in vars(args).items() if key != "secret"}
+    print_report(summary)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
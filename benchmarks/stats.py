@@ -0,0 +1,34 @@
+"""Small statistics helpers shared by the benchmark scripts."""
+
+
+def percentile(values, p: float):
+    """Nearest-rank percentile of `values` (None when empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(values) -> dict:
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values),
+    }
+
+
+HEADER = f"  {'':<28} {'n':>6} {'mean':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}"
+
+
+def format_row(name: str, s: dict) -> str:
+    """One table row under HEADER for a summarize() result."""
+    if not s.get("count"):
+        return f"  {name:<28} {'-':>6}"
+    return (f"  {name:<28} {s['count']:>6} {s['mean']:>9.3f} {s['p50']:>9.3f} "
+            f"{s['p95']:>9.3f} {s['p99']:>9.3f} {s['max']:>9.3f}")
@@ -0,0 +1,265 @@
+"""
+Local stand-ins for the services a job talks to: the AIPipe responses
+endpoint, the GitHub REST endpoints used by github_service_2, and an
+evaluation receiver. Each server has configurable latency and failure
+injection so the pipeline can be benchmarked offline.
+"""
+import json
+import time
+import random
+import hashlib
+import itertools
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class Behaviour:
+    """Latency (mean ± jitter, seconds) and failure rate applied to every request of a stub."""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, failure_rate: float = 0.0,
+                 failure_status: int = 500):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+
+    def delay(self):
+        seconds = self.latency + random.uniform(-self.jitter, self.jitter)
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def should_fail(self) -> bool:
+        return self.failure_rate > 0 and random.random() < self.failure_rate
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    stub = None  # set on the per-server subclass
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        return json.loads(raw) if raw else None
+
+    def _reply(self, status: int, payload=None):
+        body = json.dumps(payload if payload is not None else {}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, method: str):
+        self.stub.behaviour.delay()
+        body = self._body()
+        if self.stub.behaviour.should_fail():
+            self.stub.count("failed")
+            return self._reply(self.stub.behaviour.failure_status, {"message": "injected failure"})
+        status, payload = self.stub.route(method, self.path.split("?", 1)[0], body)
+        self.stub.count(str(status))
+        self._reply(status, payload)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PATCH(self):
+        self._handle("PATCH")
+
+
+class StubServer:
+    """Threaded HTTP server on 127.0.0.1 (random port unless given) running in the background."""
+
+    def __init__(self, behaviour: Behaviour | None = None, port: int = 0):
+        self.behaviour = behaviour or Behaviour()
+        self.requests = {}
+        self._lock = threading.Lock()
+        handler = type(f"{type(self).__name__}Handler", (_Handler,), {"stub": self})
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, key: str):
+        with self._lock:
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def route(self, method: str, path: str, body):
+        raise NotImplementedError
+
+
+def synthetic_response(files: int = 5, file_bytes: int = 2_000) -> str:
+    """An LLM answer in the <response><file>... format with `files` files of about `file_bytes` each."""
+    parts = ["<response>"]
+    for i in range(files):
+        name = "index.html" if i == 0 else f"assets/file_{i}.js"
+        line = f"// generated line for {name}\n"
+        content = (line * (file_bytes // len(line) + 1))[:file_bytes]
+        parts.append(
+            f"  <file>\n    <path>{name}</path>\n    <language>text</language>\n"
+            f"    <content><![CDATA[\n{content}\n]]></content>\n  </file>"
+        )
+    parts.append("</response>")
+    return "\n".join(parts)
+
+
+class AIPipeStub(StubServer):
+    """POST /openai/v1/responses answering with a fixed synthetic file set."""
+
+    def __init__(self, behaviour=None, files: int = 5, file_bytes: int = 2_000, port: int = 0):
+        super().__init__(behaviour, port)
+        self.response_text = synthetic_response(files, file_bytes)
+
+    @property
+    def responses_url(self) -> str:
+        return f"{self.url}/openai/v1/responses"
+
+    def route(self, method, path, body):
+        if method == "POST" and path.endswith("/responses"):
+            # Rough token counts (~4 characters each) so the LLM ledger has something to record
+            input_tokens = len((body or {}).get("input", "")) // 4
+            usage = {"input_tokens": input_tokens, "input_tokens_details": {"cached_tokens": 0},
+                     "output_tokens": len(self.response_text) // 4}
+            return 200, {"output": [{"content": [{"type": "output_text", "text": self.response_text}]}],
+                         "usage": usage}
+        return 404, {"message": "Not Found"}
+
+
+class GitHubStub(StubServer):
+    """
+    In-memory GitHub covering the calls made by github_service_2: repo
+    creation, git refs/commits/blobs/trees, branch lookup and Pages.
+    """
+
+    def __init__(self, behaviour=None, owner: str = "bench", port: int = 0):
+        super().__init__(behaviour, port)
+        self.owner = owner
+        self.repos = {}  # full_name -> {"head": sha, "pages": bool}
+        self.commits = {}  # sha -> {"tree": sha, "parents": [sha]}
+        self._seq = itertools.count()
+
+    def _sha(self) -> str:
+        return hashlib.sha1(str(next(self._seq)).encode()).hexdigest()
+
+    def _repo_json(self, full_name):
+        name = full_name.split("/", 1)[1]
+        return {"id": abs(hash(full_name)) % 10**9, "name": name, "full_name": full_name,
+                "owner": {"login": self.owner}, "private": False, "default_branch": "main",
+                "url": f"{self.url}/repos/{full_name}", "html_url": f"https://github.com/{full_name}"}
+
+    def _ref_json(self, full_name):
+        sha = self.repos[full_name]["head"]
+        return {"ref": "refs/heads/main", "url": f"{self.url}/repos/{full_name}/git/refs/heads/main",
+                "object": {"sha": sha, "type": "commit", "url": f"{self.url}/repos/{full_name}/git/commits/{sha}"}}
+
+    def _commit_json(self, full_name, sha):
+        commit = self.commits[sha]
+        base = f"{self.url}/repos/{full_name}/git"
+        return {"sha": sha, "url": f"{base}/commits/{sha}", "message": commit.get("message", ""),
+                "tree": {"sha": commit["tree"], "url": f"{base}/trees/{commit['tree']}"},
+                "parents": [{"sha": p, "url": f"{base}/commits/{p}"} for p in commit["parents"]]}
+
+    def _new_commit(self, tree: str, parents, message: str = "") -> str:
+        sha = self._sha()
+        self.commits[sha] = {"tree": tree, "parents": list(parents), "message": message}
+        return sha
+
+    def route(self, method, path, body):
+        body = body or {}
+        if path == "/user" and method == "GET":
+            return 200, {"login": self.owner, "url": f"{self.url}/user"}
+        if path == "/user/repos" and method == "POST":
+            full_name = f"{self.owner}/{body['name']}"
+            with self._lock:
+                if full_name in self.repos:
+                    return 422, {"message": "Repository creation failed.",
+                                 "errors": [{"message": "name already exists on this account"}]}
+                self.repos[full_name] = {"head": self._new_commit(self._sha(), [], "Initial commit")}
+            return 201, self._repo_json(full_name)
+
+        parts = path.strip("/").split("/")
+        if len(parts) < 3 or parts[0] != "repos":
+            return 404, {"message": "Not Found"}
+        full_name = f"{parts[1]}/{parts[2]}"
+        rest = parts[3:]
+        with self._lock:
+            if full_name not in self.repos:
+                return 404, {"message": "Not Found"}
+            if not rest and method == "GET":
+                return 200, self._repo_json(full_name)
+            if rest[:2] in (["git", "ref"], ["git", "refs"]) and method == "GET":
+                return 200, self._ref_json(full_name)
+            if rest[:2] == ["git", "refs"] and method == "PATCH":
+                self.repos[full_name]["head"] = body["sha"]
+                return 200, self._ref_json(full_name)
+            if rest[:2] == ["git", "commits"] and method == "GET" and len(rest) == 3:
+                if rest[2] not in self.commits:
+                    return 404, {"message": "Not Found"}
+                return 200, self._commit_json(full_name, rest[2])
+            if rest == ["git", "commits"] and method == "POST":
+                sha = self._new_commit(body["tree"], body.get("parents", []), body.get("message", ""))
+                return 201, self._commit_json(full_name, sha)
+            if rest == ["git", "blobs"] and method == "POST":
+                sha = self._sha()
+                return 201, {"sha": sha, "url": f"{self.url}/repos/{full_name}/git/blobs/{sha}"}
+            if rest == ["git", "trees"] and method == "POST":
+                sha = self._sha()
+                return 201, {"sha": sha, "url": f"{self.url}/repos/{full_name}/git/trees/{sha}", "tree": []}
+            if rest == ["branches", "main"] and method == "GET":
+                return 200, {"name": "main", "commit": {"sha": self.repos[full_name]["head"]}}
+            if rest == ["pages"] and method == "GET":
+                if not self.repos[full_name].get("pages"):
+                    return 404, {"message": "Not Found"}
+                return 200, {"url": f"{self.url}/repos/{full_name}/pages", "status": "built"}
+            if rest == ["pages"] and method == "POST":
+                if self.repos[full_name].get("pages"):
+                    return 409, {"message": "GitHub Pages is already enabled."}
+                self.repos[full_name]["pages"] = True
+                return 201, {"url": f"{self.url}/repos/{full_name}/pages", "status": "queued"}
+        return 404, {"message": "Not Found"}
+
+
+class EvaluationStub(StubServer):
+    """Accepts evaluation POSTs and wakes up whoever is waiting for that nonce."""
+
+    def __init__(self, behaviour=None, port: int = 0):
+        super().__init__(behaviour, port)
+        self.received = {}  # nonce -> (received_at, payload)
+        self._cond = threading.Condition()
+
+    def route(self, method, path, body):
+        if method != "POST" or not body:
+            return 404, {"message": "Not Found"}
+        with self._cond:
+            self.received.setdefault(body.get("nonce"), (time.time(), body))
+            self._cond.notify_all()
+        return 200, {"status": "ok"}
+
+    def wait_for(self, nonce: str, timeout: float):
+        """(received_at, payload) of the first submission for `nonce`, or None on timeout."""
+        end = time.time() + timeout
+        with self._cond:
+            while nonce not in self.received:
+                remaining = end - time.time()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            return self.received[nonce]